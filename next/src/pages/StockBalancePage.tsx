@@ -60,7 +60,7 @@ export default function StockBalancePage() {
             }
         }).then((res) => {
             setData(res.message[1]);
-            setTotal(res.message[2]);
+            setTotal(res.message[4]?.total ?? 0);
         })
     }, [debouncedName, warehouse, sort, page, pageSize]);
 
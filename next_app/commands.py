@@ -0,0 +1,43 @@
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("next-app-benchmark")
+@click.option("--scale", default="10k", type=click.Choice(["10k", "1m", "10m"]), help="Size of the synthetic data set")
+@click.option("--seed-data", is_flag=True, default=False, help="(Re)seed the synthetic data before timing")
+@click.option("--repeat", default=3, type=int, help="Runs per scenario")
+@click.option("--output", default=None, help="File to write the results to")
+@click.option("--format", "output_format", default="json", type=click.Choice(["json", "csv"]))
+@pass_context
+def benchmark(context, scale, seed_data, repeat, output, output_format):
+    """Time every next_app report against synthetic data."""
+    import frappe
+    from next_app.next_app.benchmark import run, seed
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    frappe.set_user("Administrator")
+    try:
+        if seed_data:
+            seed(scale)
+        run(scale, repeat=repeat, output=output, output_format=output_format)
+    finally:
+        frappe.destroy()
+
+
+@click.command("next-app-clear-benchmark-data")
+@pass_context
+def clear_benchmark_data(context):
+    """Delete the synthetic data written by next-app-benchmark."""
+    import frappe
+    from next_app.next_app.benchmark import clear
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        clear()
+    finally:
+        frappe.destroy()
+
+
+commands = [benchmark, clear_benchmark_data]
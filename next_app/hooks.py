@@ -83,7 +83,14 @@ app_license = "mit"
 # ------------
 
 # before_install = "next_app.install.before_install"
-# after_install = "next_app.next_app.custom_fields.setup_custom_fields_on_load"
+after_install = [
+    "next_app.next_app.custom_fields.setup_custom_fields",
+    "next_app.next_app.sync.add_sync_indexes"
+]
+after_migrate = [
+    "next_app.next_app.custom_fields.setup_custom_fields",
+    "next_app.next_app.sync.add_sync_indexes"
+]
 
 # Uninstallation
 # ------------
@@ -142,7 +149,95 @@ doc_events = {
         "before_validate": "next_app.next_app.utils.set_source_exchange_rate"
     },
     "Warehouse": {
-        "before_insert": "next_app.next_app.utils.on_warehouse_before_insert"
+        "before_insert": "next_app.next_app.utils.on_warehouse_before_insert",
+        "on_update": "next_app.next_app.metadata_cache.on_update",
+        "on_trash": "next_app.next_app.metadata_cache.on_trash",
+        "after_rename": "next_app.next_app.metadata_cache.after_rename"
+    },
+    "Item": {
+        "on_update": [
+            "next_app.next_app.metadata_cache.on_update",
+            "next_app.next_app.search.on_update"
+        ],
+        "on_trash": [
+            "next_app.next_app.metadata_cache.on_trash",
+            "next_app.next_app.search.on_trash"
+        ],
+        "after_rename": [
+            "next_app.next_app.metadata_cache.after_rename",
+            "next_app.next_app.search.after_rename"
+        ]
+    },
+    "Customer": {
+        "on_update": [
+            "next_app.next_app.metadata_cache.on_update",
+            "next_app.next_app.search.on_update"
+        ],
+        "on_trash": [
+            "next_app.next_app.metadata_cache.on_trash",
+            "next_app.next_app.search.on_trash"
+        ],
+        "after_rename": [
+            "next_app.next_app.metadata_cache.after_rename",
+            "next_app.next_app.search.after_rename"
+        ]
+    },
+    "Supplier": {
+        "on_update": "next_app.next_app.metadata_cache.on_update",
+        "on_trash": "next_app.next_app.metadata_cache.on_trash",
+        "after_rename": "next_app.next_app.metadata_cache.after_rename"
+    },
+    "Stock Ledger Entry": {
+        "on_submit": [
+            "next_app.next_app.doctype.stock_balance_snapshot.stock_balance_snapshot.on_stock_ledger_entry_submit",
+            "next_app.next_app.closing_balance.on_stock_ledger_entry_submit",
+            "next_app.next_app.report_cache.on_document_change",
+            "next_app.next_app.realtime.on_document_change"
+        ]
+    },
+    "GL Entry": {
+        "on_submit": [
+            "next_app.next_app.doctype.party_balance.party_balance.on_gl_entry_submit",
+            "next_app.next_app.closing_balance.on_gl_entry_submit",
+            "next_app.next_app.report_cache.on_document_change",
+            "next_app.next_app.realtime.on_document_change"
+        ]
+    },
+    "Sales Invoice": {
+        "on_update": [
+            "next_app.next_app.search.on_update",
+            "next_app.next_app.report_cache.on_document_change"
+        ],
+        "on_trash": [
+            "next_app.next_app.search.on_trash",
+            "next_app.next_app.report_cache.on_document_change"
+        ],
+        "after_rename": [
+            "next_app.next_app.search.after_rename",
+            "next_app.next_app.report_cache.on_document_change"
+        ],
+        "on_submit": [
+            "next_app.next_app.doctype.party_balance.party_balance.on_invoice_submit",
+            "next_app.next_app.report_cache.on_document_change",
+            "next_app.next_app.realtime.on_document_change"
+        ],
+        "on_cancel": [
+            "next_app.next_app.doctype.party_balance.party_balance.on_invoice_cancel",
+            "next_app.next_app.report_cache.on_document_change",
+            "next_app.next_app.realtime.on_document_change"
+        ]
+    },
+    "Purchase Invoice": {
+        "on_submit": [
+            "next_app.next_app.doctype.party_balance.party_balance.on_invoice_submit",
+            "next_app.next_app.report_cache.on_document_change",
+            "next_app.next_app.realtime.on_document_change"
+        ],
+        "on_cancel": [
+            "next_app.next_app.doctype.party_balance.party_balance.on_invoice_cancel",
+            "next_app.next_app.report_cache.on_document_change",
+            "next_app.next_app.realtime.on_document_change"
+        ]
     }
 }
 
@@ -167,6 +262,15 @@ doc_events = {
 # 	],
 # }
 
+scheduler_events = {
+    "daily": [
+        "next_app.next_app.doctype.stock_balance_snapshot.stock_balance_snapshot.rebuild_stock_balance_snapshot"
+    ],
+    "monthly": [
+        "next_app.next_app.closing_balance.build_closing_balances"
+    ]
+}
+
 # Testing
 # -------
 
@@ -197,13 +301,14 @@ doc_events = {
 
 # Request Events
 # ----------------
-before_request = ["next_app.next_app.custom_fields.setup_custom_fields_on_load"]
-# after_request = ["next_app.utils.after_request"]
+# /next shell revalidation; reads Redis only, and only for /next paths
+before_request = ["next_app.www.next.check_not_modified"]
+after_request = ["next_app.www.next.set_etag", "next_app.next_app.replica.close_replica"]
 
 # Job Events
 # ----------
 # before_job = ["next_app.utils.before_job"]
-# after_job = ["next_app.utils.after_job"]
+after_job = ["next_app.next_app.replica.close_replica"]
 
 # User Data Protection
 # --------------------
@@ -243,5 +348,9 @@ before_request = ["next_app.next_app.custom_fields.setup_custom_fields_on_load"]
 # 	"Logging DocType Name": 30  # days to retain logs
 # }
 
+default_log_clearing_doctypes = {
+    "Report Profile Log": 30
+}
+
 
 website_route_rules = [{'from_route': '/next/<path:app_path>', 'to_route': 'next'},]
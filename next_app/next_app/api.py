@@ -1,6 +1,77 @@
 import frappe
+from frappe import _
+from werkzeug.wrappers import Response
 from .utils import get_default_company_info as get_company_info_from_utils
 
+# Calls accepted by run_batch in one request
+MAX_BATCH_CALLS = 20
+# Whitelisted methods that write their own response body instead of returning data
+RESPONSE_METHODS = {
+    "next_app.next_app.columnar.run_report",
+    "next_app.next_app.ledger_export.export_ledger",
+}
+
 @frappe.whitelist()
 def get_default_company_info():
-    return get_company_info_from_utils()
\ No newline at end of file
+    return get_company_info_from_utils()
+
+@frappe.whitelist(methods=["POST"])
+def run_batch(calls):
+    """Run several whitelisted methods in one request.
+
+    ``calls`` is a list of ``{"method": "dotted.path", "args": {...}}``. Each
+    call gets the same whitelist and permission checks as its own request
+    would, and runs in its own savepoint, so a failing call is rolled back and
+    reported without affecting the others. Results come back in order as
+    ``{"method", "result"}`` or ``{"method", "error", "messages"}``; only
+    validation errors carry their message and ``exc_type``, anything else is
+    reported generically and logged to the Error Log. Methods that return
+    their own response (file downloads, columnar reports) can not be batched.
+
+    Calls run one after another: they share this request's session and
+    database connection, which cannot be used from several threads at once.
+    """
+    calls = frappe.parse_json(calls)
+    if not isinstance(calls, list):
+        frappe.throw(_("calls must be a list"))
+    if len(calls) > MAX_BATCH_CALLS:
+        frappe.throw(_("At most {0} calls can be batched").format(MAX_BATCH_CALLS))
+
+    return [run_batch_call(i, call) for i, call in enumerate(calls)]
+
+def run_batch_call(index, call):
+    method_name = call.get("method")
+    savepoint = f"next_app_batch_{index}"
+    message_count = len(frappe.local.message_log)
+    frappe.db.savepoint(savepoint)
+    try:
+        method = frappe.get_attr(method_name)
+        if method is run_batch:
+            frappe.throw(_("run_batch can not be nested"))
+        if f"{method.__module__}.{method.__qualname__}" in RESPONSE_METHODS:
+            frappe.throw(_("{0} returns its own response and can not be batched").format(method_name))
+        frappe.is_whitelisted(method)
+        result = frappe.call(method, **(call.get("args") or {}))
+        if isinstance(result, Response):
+            frappe.throw(_("{0} returns its own response and can not be batched").format(method_name))
+    except Exception as e:
+        try:
+            frappe.db.rollback(save_point=savepoint)
+        except Exception:
+            # The method committed, which released the savepoint; its writes stay
+            frappe.logger("next_app").warning(f"run_batch could not roll back {method_name}", exc_info=True)
+        messages = frappe.local.message_log[message_count:]
+        del frappe.local.message_log[message_count:]
+        return {"method": method_name, "messages": messages, **get_batch_error(method_name, e)}
+    return {"method": method_name, "result": result}
+
+def get_batch_error(method_name, e):
+    """What a failed call reports: validation messages as raised, anything else
+    only as a generic error, with the traceback in the Error Log."""
+    if isinstance(e, frappe.ValidationError):
+        return {"error": str(e), "exc_type": type(e).__name__}
+    error_log = frappe.log_error(title=f"run_batch: {method_name} failed")
+    error = {"error": _("{0} failed; see the Error Log").format(method_name)}
+    if "System Manager" in frappe.get_roles():
+        error["error_log"] = error_log.name
+    return error
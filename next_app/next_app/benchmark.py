@@ -0,0 +1,298 @@
+"""Synthetic-data benchmarks for the next_app reports.
+
+``bench --site <site> next-app-benchmark --scale 10k --seed-data`` fills the
+site with BENCH- prefixed Customers, Suppliers, Items, Warehouses, GL Entries,
+Stock Ledger Entries and Sales Invoices, then times every report's ``execute``
+over a fixed set of filter and page combinations. Data is generated from a
+fixed random seed, so two commits benchmarked on the same site compare like
+for like. Use a throwaway site: rows are written straight into the tables.
+"""
+
+import csv
+import json
+import random
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import timedelta
+
+import click
+import frappe
+from frappe.utils import add_days, getdate, today
+
+PREFIX = "BENCH-"
+
+# Rows of GL Entry and Stock Ledger Entry; everything else is derived from it
+SCALES = {
+    "10k": 10_000,
+    "1m": 1_000_000,
+    "10m": 10_000_000,
+}
+
+WAREHOUSE_COUNT = 10
+# Sales Invoices generated and inserted, with their items, at a time
+INVOICE_CHUNK = 10_000
+HISTORY_DAYS = 3 * 365
+
+REPORTS = "next_app.next_app.report.{0}.{0}.execute"
+
+
+def get_counts(rows):
+    return frappe._dict(
+        customers=max(rows // 100, 10),
+        suppliers=max(rows // 200, 10),
+        items=max(rows // 200, 10),
+        warehouses=WAREHOUSE_COUNT,
+        gl_entries=rows,
+        stock_ledger_entries=rows,
+        sales_invoices=max(rows // 10, 10),
+    )
+
+
+# --- Seeding ---
+
+def seed(scale, random_seed=42):
+    """Insert the synthetic data set for ``scale`` and rebuild next_app's derived tables."""
+    from next_app.next_app.closing_balance import rebuild_closing_balances
+    from next_app.next_app.doctype.party_balance.party_balance import rebuild_party_balance
+    from next_app.next_app.doctype.stock_balance_snapshot.stock_balance_snapshot import rebuild_stock_balance_snapshot
+    from next_app.next_app.search import rebuild_search_tokens
+
+    clear()
+    counts = get_counts(SCALES[scale])
+    rng = random.Random(random_seed)
+    company = frappe.defaults.get_global_default("company")
+    currency = frappe.get_cached_value("Company", company, "default_currency")
+    receivable = frappe.get_cached_value("Company", company, "default_receivable_account")
+    payable = frappe.get_cached_value("Company", company, "default_payable_account")
+    start_date = getdate(add_days(today(), -HISTORY_DAYS))
+    now = frappe.utils.now()
+
+    def names(kind, count):
+        return [f"{PREFIX}{kind}-{i:08d}" for i in range(count)]
+
+    customers = names("CUST", counts.customers)
+    suppliers = names("SUPP", counts.suppliers)
+    items = names("ITEM", counts.items)
+    warehouses = names("WH", counts.warehouses)
+
+    def random_date():
+        return start_date + timedelta(days=rng.randrange(HISTORY_DAYS))
+
+    frappe.db.bulk_insert("Customer", ["name", "customer_name", "creation", "modified", "owner"],
+        ((c, c, now, now, "Administrator") for c in customers))
+    frappe.db.bulk_insert("Supplier", ["name", "supplier_name", "creation", "modified", "owner"],
+        ((s, s, now, now, "Administrator") for s in suppliers))
+    frappe.db.bulk_insert("Item", ["name", "item_code", "item_name", "is_stock_item", "stock_uom", "creation", "modified", "owner"],
+        ((i, i, f"Item {i}", 1, "Nos", now, now, "Administrator") for i in items))
+    frappe.db.bulk_insert("Warehouse", ["name", "warehouse_name", "company", "creation", "modified", "owner"],
+        ((w, w, company, now, now, "Administrator") for w in warehouses))
+
+    def gl_entries():
+        parties = [("Customer", c, receivable) for c in customers] + [("Supplier", s, payable) for s in suppliers]
+        for i in range(counts.gl_entries):
+            party_type, party, account = rng.choice(parties)
+            amount = round(rng.uniform(1, 1000), 2)
+            is_debit = rng.random() < 0.6
+            yield (
+                f"{PREFIX}GLE-{i:010d}", random_date(), party_type, party, account,
+                amount if is_debit else 0, 0 if is_debit else amount,
+                "Journal Entry", f"{PREFIX}JV-{i // 2:010d}", "", company, 1, 0, now, now, "Administrator",
+            )
+
+    frappe.db.bulk_insert("GL Entry", [
+        "name", "posting_date", "party_type", "party", "account", "debit", "credit",
+        "voucher_type", "voucher_no", "against", "company", "docstatus", "is_cancelled",
+        "creation", "modified", "owner",
+    ], gl_entries())
+
+    def stock_ledger_entries():
+        for i in range(counts.stock_ledger_entries):
+            qty = rng.choice([-1, 1]) * rng.randint(1, 20)
+            rate = round(rng.uniform(1, 100), 2)
+            yield (
+                f"{PREFIX}SLE-{i:010d}", rng.choice(items), rng.choice(warehouses), random_date(),
+                f"{rng.randrange(24):02d}:{rng.randrange(60):02d}:00", qty, rate, qty * rate, qty * rate,
+                "Stock Entry", f"{PREFIX}STE-{i // 2:010d}", company, 1, 0, now, now, "Administrator",
+            )
+
+    frappe.db.bulk_insert("Stock Ledger Entry", [
+        "name", "item_code", "warehouse", "posting_date", "posting_time", "actual_qty", "valuation_rate",
+        "stock_value", "stock_value_difference", "voucher_type", "voucher_no", "company", "docstatus",
+        "is_cancelled", "creation", "modified", "owner",
+    ], stock_ledger_entries())
+
+    def sales_invoices(start, stop, invoice_items):
+        for i in range(start, stop):
+            name = f"{PREFIX}SINV-{i:09d}"
+            total = 0
+            for idx in range(1, rng.randint(1, 5) + 1):
+                item = rng.choice(items)
+                qty = rng.randint(1, 10)
+                rate = round(rng.uniform(1, 100), 2)
+                total += qty * rate
+                invoice_items.append((
+                    f"{name}-{idx}", name, "Sales Invoice", "items", idx, item, f"Item {item}",
+                    qty, rate, qty * rate, qty, now, now, "Administrator",
+                ))
+            status = rng.choice(["Paid", "Unpaid", "Overdue"])
+            outstanding = 0 if status == "Paid" else total
+            yield (
+                name, rng.choice(customers), random_date(), "12:00:00", total, total, outstanding, status,
+                currency, company, 1, 0, rng.choice(warehouses), 1, now, now, "Administrator",
+            )
+
+    for start in range(0, counts.sales_invoices, INVOICE_CHUNK):
+        invoice_items = []
+        frappe.db.bulk_insert("Sales Invoice", [
+            "name", "customer", "posting_date", "posting_time", "grand_total", "base_grand_total",
+            "outstanding_amount", "status", "currency", "company", "docstatus", "is_return", "set_warehouse",
+            "update_stock", "creation", "modified", "owner",
+        ], sales_invoices(start, min(start + INVOICE_CHUNK, counts.sales_invoices), invoice_items))
+        frappe.db.bulk_insert("Sales Invoice Item", [
+            "name", "parent", "parenttype", "parentfield", "idx", "item_code", "item_name", "qty", "rate",
+            "amount", "delivered_qty", "creation", "modified", "owner",
+        ], invoice_items)
+
+    rebuild_stock_balance_snapshot()
+    rebuild_party_balance()
+    rebuild_closing_balances()
+    rebuild_search_tokens()
+    frappe.db.commit()
+    return counts
+
+
+def clear():
+    """Delete every BENCH- row written by ``seed``, and the derived rows built from them."""
+    for doctype, field in [
+        ("Search Token", "ref_name"),
+        ("Stock Closing Balance", "item_code"),
+        ("Party Closing Balance", "party"),
+        ("Stock Balance Snapshot", "item_code"),
+        ("Party Balance", "party"),
+        ("Sales Invoice Item", "parent"),
+        ("Sales Invoice", "name"),
+        ("Stock Ledger Entry", "name"),
+        ("GL Entry", "name"),
+        ("Warehouse", "name"),
+        ("Item", "name"),
+        ("Supplier", "name"),
+        ("Customer", "name"),
+    ]:
+        frappe.db.sql(f"DELETE FROM `tab{doctype}` WHERE `{field}` LIKE %s", (f"{PREFIX}%",))
+    frappe.db.commit()
+
+
+# --- Timing ---
+
+def get_scenarios():
+    """(report, label, filters) combinations timed by ``run``."""
+    month_ago = add_days(today(), -30)
+    year_ago = add_days(today(), -365)
+    customer = f"{PREFIX}CUST-00000001"
+    warehouse = f"{PREFIX}WH-00000001"
+    return [
+        ("sales_invoice", "first page", {}),
+        ("sales_invoice", "last 30 days", {"date_range": [month_ago, today()]}),
+        ("sales_invoice", "customer search", {"customer": "CUST-0000"}),
+        ("sales_invoice", "deep offset", {"limit_start": 10_000}),
+        ("sales_invoice", "cursor first page", {"pagination": "cursor"}),
+        ("sales_invoice", "without items", {"include_items": 0}),
+        ("custom_stock_balance", "first page", {}),
+        ("custom_stock_balance", "warehouse", {"warehouse": warehouse}),
+        ("custom_stock_balance", "item search", {"name": "ITEM-000"}),
+        ("custom_stock_balance", "deep offset", {"limit_start": 1_000}),
+        ("custom_customer_balance", "first page", {}),
+        ("custom_customer_balance", "hide zero, by outstanding", {"hide_zero_balances": 1, "order_by": "outstanding_amount", "order": "desc"}),
+        ("custom_customer_balance", "deep offset", {"start": 1_000}),
+        ("customer_balance", "all customers", {}),
+        ("supplier_balance", "all suppliers", {}),
+        ("customer_ledger", "one customer, full history", {"customer": customer}),
+        ("customer_ledger", "one customer, last year", {"customer": customer, "from_date": year_ago, "to_date": today()}),
+        ("customer_ledger", "one customer, deep offset", {"customer": customer, "from_date": year_ago, "to_date": today(), "start": 100}),
+        ("customer_ledger", "all customers, last 30 days", {"from_date": month_ago, "to_date": today()}),
+        ("stock_ledger_report", "warehouse, last year", {"warehouse": warehouse, "from_date": year_ago, "to_date": today()}),
+        ("stock_ledger_report", "warehouse, deep offset", {"warehouse": warehouse, "from_date": year_ago, "to_date": today(), "start": 5_000}),
+        ("stock_ledger_report", "all, last 30 days", {"from_date": month_ago, "to_date": today()}),
+    ]
+
+
+@contextmanager
+def count_queries():
+    """Count the statements run through frappe.db.sql inside the block."""
+    counter = {"queries": 0}
+    sql = frappe.db.sql
+
+    def counting_sql(*args, **kwargs):
+        counter["queries"] += 1
+        return sql(*args, **kwargs)
+
+    frappe.db.sql = counting_sql
+    try:
+        yield counter
+    finally:
+        frappe.db.sql = sql
+
+
+def time_execute(report, filters, repeat):
+    execute = frappe.get_attr(REPORTS.format(report))
+    timings = []
+    queries = peak_memory = rows = 0
+    for _ in range(repeat):
+        frappe.clear_cache()
+        tracemalloc.start()
+        with count_queries() as counter:
+            started = time.perf_counter()
+            result = execute(frappe._dict(filters))
+            timings.append(time.perf_counter() - started)
+        peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        queries = counter["queries"]
+        rows = len(result[1] or [])
+    timings.sort()
+    return {
+        "min_ms": round(timings[0] * 1000, 2),
+        "median_ms": round(timings[len(timings) // 2] * 1000, 2),
+        "max_ms": round(timings[-1] * 1000, 2),
+        "queries": queries,
+        "rows": rows,
+        "peak_memory_kb": round(peak_memory / 1024, 1),
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=frappe.get_app_path("next_app"), text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scale, repeat=3, output=None, output_format="json"):
+    """Time every scenario and optionally write the results to ``output``."""
+    # Time the reports themselves, not the result cache
+    frappe.conf.next_app_disable_report_cache = 1
+    results = []
+    for report, label, filters in get_scenarios():
+        result = {"report": report, "scenario": label, **time_execute(report, filters, repeat)}
+        results.append(result)
+        click.echo(f"{report:<26} {label:<34} {result['median_ms']:>10} ms {result['queries']:>4} queries")
+
+    if output:
+        if output_format == "csv":
+            with open(output, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(results[0]))
+                writer.writeheader()
+                writer.writerows(results)
+        else:
+            with open(output, "w") as f:
+                json.dump({
+                    "site": frappe.local.site,
+                    "scale": scale,
+                    "commit": get_commit(),
+                    "repeat": repeat,
+                    "results": results,
+                }, f, indent=1)
+    return results
@@ -0,0 +1,273 @@
+"""Month-end closing balances for the party and stock ledgers.
+
+A row is written for every party (or item and warehouse) that had postings in
+a month, holding its cumulative balance at that month end. A key without a row
+for some month simply had no postings in it, so its latest row on or before a
+date is its closing balance there. An opening balance is then one snapshot
+lookup plus a SUM over the days since that month end.
+
+Months are closed by the monthly scheduler; entries posted into an already
+closed month are folded into the stored rows by the GL Entry and Stock Ledger
+Entry hooks below.
+"""
+
+import frappe
+from frappe.utils import add_days, add_months, flt, get_first_day, get_last_day, getdate, today
+
+GL_CLOSED_THROUGH = "next_app_gl_closed_through"
+STOCK_CLOSED_THROUGH = "next_app_stock_closed_through"
+
+# Only live GL entries count, matching customer_ledger
+GL_CONDITIONS = """gle.docstatus = 1 AND gle.is_cancelled = 0
+    AND gle.party_type IN ('Customer', 'Supplier') AND IFNULL(gle.party, '') != ''"""
+
+
+def get_closed_through(key):
+    closed_through = frappe.db.get_global(key)
+    return getdate(closed_through) if closed_through else None
+
+
+def get_snapshot_period(key, date):
+    """Latest closed month end strictly before ``date``, or None."""
+    closed_through = get_closed_through(key)
+    if not closed_through:
+        return None
+    period_end = min(closed_through, get_last_day(add_months(getdate(date), -1)))
+    return period_end if period_end < getdate(date) else None
+
+
+def get_pending_periods(key, first_posting_date):
+    """(start, end) of every complete month after the last closed one."""
+    closed_through = get_closed_through(key)
+    if closed_through:
+        period_start = add_days(closed_through, 1)
+    elif first_posting_date:
+        period_start = get_first_day(first_posting_date)
+    else:
+        return
+
+    last_complete = get_last_day(add_months(today(), -1))
+    while period_start <= last_complete:
+        period_end = get_last_day(period_start)
+        yield period_start, period_end
+        period_start = add_days(period_end, 1)
+
+
+# --- Building ---
+
+def build_closing_balances():
+    """Close every complete month that has no snapshot yet (monthly scheduler).
+
+    Catches up on missed runs, and on a fresh install builds the full history.
+    """
+    first_gl_date = frappe.db.sql("SELECT MIN(posting_date) FROM `tabGL Entry`")[0][0]
+    for period_start, period_end in get_pending_periods(GL_CLOSED_THROUGH, first_gl_date):
+        close_gl_period(period_start, period_end)
+        frappe.db.set_global(GL_CLOSED_THROUGH, str(period_end))
+        frappe.db.commit()
+
+    first_sle_date = frappe.db.sql("SELECT MIN(posting_date) FROM `tabStock Ledger Entry`")[0][0]
+    for period_start, period_end in get_pending_periods(STOCK_CLOSED_THROUGH, first_sle_date):
+        close_stock_period(period_start, period_end)
+        frappe.db.set_global(STOCK_CLOSED_THROUGH, str(period_end))
+        frappe.db.commit()
+
+
+@frappe.whitelist()
+def rebuild_closing_balances():
+    """Drop every snapshot and rebuild the full history (for reconciliation)."""
+    frappe.only_for("System Manager")
+    frappe.db.sql("DELETE FROM `tabParty Closing Balance`")
+    frappe.db.sql("DELETE FROM `tabStock Closing Balance`")
+    frappe.db.set_global(GL_CLOSED_THROUGH, "")
+    frappe.db.set_global(STOCK_CLOSED_THROUGH, "")
+    build_closing_balances()
+
+
+def close_gl_period(period_start, period_end):
+    frappe.db.sql(f"""
+        INSERT INTO `tabParty Closing Balance`
+            (name, creation, modified, owner, modified_by, docstatus,
+             party_type, party, period_end, closing_balance)
+        SELECT
+            MD5(CONCAT(m.party_type, '::', m.party, '::', %(period_end)s)),
+            NOW(6), NOW(6), 'Administrator', 'Administrator', 0,
+            m.party_type, m.party, %(period_end)s,
+            m.amount + IFNULL((
+                SELECT p.closing_balance
+                FROM `tabParty Closing Balance` p
+                WHERE p.party_type = m.party_type AND p.party = m.party AND p.period_end < %(period_end)s
+                ORDER BY p.period_end DESC
+                LIMIT 1
+            ), 0)
+        FROM (
+            SELECT gle.party_type, gle.party, SUM(gle.debit - gle.credit) AS amount
+            FROM `tabGL Entry` gle
+            WHERE {GL_CONDITIONS}
+              AND gle.posting_date BETWEEN %(period_start)s AND %(period_end)s
+            GROUP BY gle.party_type, gle.party
+        ) m
+        ON DUPLICATE KEY UPDATE closing_balance = VALUES(closing_balance)
+    """, {"period_start": period_start, "period_end": period_end})
+
+
+def close_stock_period(period_start, period_end):
+    frappe.db.sql("""
+        INSERT INTO `tabStock Closing Balance`
+            (name, creation, modified, owner, modified_by, docstatus,
+             item_code, warehouse, period_end, closing_qty)
+        SELECT
+            MD5(CONCAT(m.item_code, '::', m.warehouse, '::', %(period_end)s)),
+            NOW(6), NOW(6), 'Administrator', 'Administrator', 0,
+            m.item_code, m.warehouse, %(period_end)s,
+            m.qty + IFNULL((
+                SELECT s.closing_qty
+                FROM `tabStock Closing Balance` s
+                WHERE s.item_code = m.item_code AND s.warehouse = m.warehouse AND s.period_end < %(period_end)s
+                ORDER BY s.period_end DESC
+                LIMIT 1
+            ), 0)
+        FROM (
+            SELECT sle.item_code, sle.warehouse, SUM(sle.actual_qty) AS qty
+            FROM `tabStock Ledger Entry` sle
+            WHERE sle.posting_date BETWEEN %(period_start)s AND %(period_end)s
+            GROUP BY sle.item_code, sle.warehouse
+        ) m
+        ON DUPLICATE KEY UPDATE closing_qty = VALUES(closing_qty)
+    """, {"period_start": period_start, "period_end": period_end})
+
+
+# --- Repairing closed months ---
+
+def on_gl_entry_submit(doc, method=None):
+    # A cancellation flags the original entries with a direct update and posts
+    # reversing entries on the original date; the reversal's amount is exactly
+    # what has to come off the closed balances.
+    if doc.party_type not in ("Customer", "Supplier") or not doc.party:
+        return
+    closed_through = get_closed_through(GL_CLOSED_THROUGH)
+    if not closed_through or getdate(doc.posting_date) > closed_through:
+        return
+    repair_closed_periods(
+        "Party Closing Balance", "closing_balance",
+        {"party_type": doc.party_type, "party": doc.party}, doc.posting_date, flt(doc.debit) - flt(doc.credit),
+    )
+
+
+def on_stock_ledger_entry_submit(doc, method=None):
+    closed_through = get_closed_through(STOCK_CLOSED_THROUGH)
+    if not closed_through or getdate(doc.posting_date) > closed_through:
+        return
+    repair_closed_periods(
+        "Stock Closing Balance", "closing_qty",
+        {"item_code": doc.item_code, "warehouse": doc.warehouse}, doc.posting_date, flt(doc.actual_qty),
+    )
+
+
+def repair_closed_periods(doctype, balance_field, key, posting_date, amount):
+    """Add ``amount`` to the closing balance of ``key`` from the month of ``posting_date`` on."""
+    if not amount:
+        return
+    period_end = get_last_day(posting_date)
+    key_condition = " AND ".join(f"{field} = %({field})s" for field in key)
+    values = {**key, "period_end": period_end, "amount": amount}
+
+    # The key may have had no postings that month; carry its previous closing forward first
+    if not frappe.db.exists(doctype, {**key, "period_end": period_end}):
+        previous = frappe.db.sql(f"""
+            SELECT {balance_field} FROM `tab{doctype}`
+            WHERE {key_condition} AND period_end < %(period_end)s
+            ORDER BY period_end DESC
+            LIMIT 1
+        """, values)
+        doc = frappe.get_doc({"doctype": doctype, **key, "period_end": period_end})
+        doc.set(balance_field, flt(previous[0][0]) if previous else 0)
+        doc.db_insert(ignore_if_duplicate=True)
+
+    frappe.db.sql(f"""
+        UPDATE `tab{doctype}`
+        SET {balance_field} = {balance_field} + %(amount)s
+        WHERE {key_condition} AND period_end >= %(period_end)s
+    """, values)
+
+
+# --- Reading ---
+
+def get_party_balance_before(party_type, party, date):
+    """GL balance (debit - credit) of a party, or of all parties of the type, before ``date``."""
+    period_end = get_snapshot_period(GL_CLOSED_THROUGH, date)
+    values = {"party_type": party_type, "party": party, "date": date, "period_end": period_end}
+    party_condition = "AND {alias}.party = %(party)s" if party else ""
+
+    balance = 0
+    if period_end:
+        balance = frappe.db.sql(f"""
+            SELECT SUM(p.closing_balance)
+            FROM `tabParty Closing Balance` p
+            WHERE p.party_type = %(party_type)s {party_condition.format(alias="p")}
+              AND p.period_end = (
+                SELECT MAX(p2.period_end) FROM `tabParty Closing Balance` p2
+                WHERE p2.party_type = p.party_type AND p2.party = p.party AND p2.period_end <= %(period_end)s
+              )
+        """, values)[0][0]
+
+    delta = frappe.db.sql(f"""
+        SELECT SUM(gle.debit) - SUM(gle.credit)
+        FROM `tabGL Entry` gle
+        WHERE gle.docstatus = 1 AND gle.is_cancelled = 0
+          AND gle.party_type = %(party_type)s {party_condition.format(alias="gle")}
+          AND gle.posting_date < %(date)s
+          {"AND gle.posting_date > %(period_end)s" if period_end else ""}
+    """, values)[0][0]
+
+    return flt(balance) + flt(delta)
+
+
+def get_stock_balances_before(date, warehouse=None, item_code=None, keys=None):
+    """Qty per (item_code, warehouse) before ``date``, optionally only for ``keys``.
+
+    Keys come back sorted, so callers that page through the openings get the
+    same order on every call.
+    """
+    period_end = get_snapshot_period(STOCK_CLOSED_THROUGH, date)
+    values = {"date": date, "period_end": period_end, "warehouse": warehouse, "item_code": item_code}
+
+    def conditions(alias):
+        cond = ""
+        if warehouse:
+            cond += f" AND {alias}.warehouse = %(warehouse)s"
+        if item_code:
+            cond += f" AND {alias}.item_code = %(item_code)s"
+        if keys is not None:
+            cond += f" AND ({alias}.item_code, {alias}.warehouse) IN %(keys)s"
+        return cond
+
+    balances = {}
+    if keys is not None:
+        if not keys:
+            return balances
+        values["keys"] = tuple(keys)
+
+    if period_end:
+        for row in frappe.db.sql(f"""
+            SELECT s.item_code, s.warehouse, s.closing_qty AS qty
+            FROM `tabStock Closing Balance` s
+            WHERE s.period_end = (
+                SELECT MAX(s2.period_end) FROM `tabStock Closing Balance` s2
+                WHERE s2.item_code = s.item_code AND s2.warehouse = s.warehouse AND s2.period_end <= %(period_end)s
+            ) {conditions("s")}
+        """, values, as_dict=True):
+            balances[(row.item_code, row.warehouse)] = flt(row.qty)
+
+    for row in frappe.db.sql(f"""
+        SELECT sle.item_code, sle.warehouse, SUM(sle.actual_qty) AS qty
+        FROM `tabStock Ledger Entry` sle
+        WHERE sle.posting_date < %(date)s
+          {"AND sle.posting_date > %(period_end)s" if period_end else ""}
+          {conditions("sle")}
+        GROUP BY sle.item_code, sle.warehouse
+    """, values, as_dict=True):
+        key = (row.item_code, row.warehouse)
+        balances[key] = balances.get(key, 0) + flt(row.qty)
+
+    return dict(sorted(balances.items()))
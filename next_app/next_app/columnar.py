@@ -0,0 +1,128 @@
+"""Compact columnar encoding of report responses.
+
+A list of row dicts repeats every key on every row, and nested child rows
+(the ``items`` of Sales Invoice) repeat theirs again. ``run_report`` returns
+the same result with each such list turned into a table::
+
+    {"__columnar__": 1, "fields": ["item_code", "qty", ...],
+     "values": [[0, 1, 0, ...], [5, 2, 8, ...], ...],
+     "dictionaries": {"item_code": ["ITEM-A", "ITEM-B"]}}
+
+``values`` holds one array per field. String columns with many repeats are
+dictionary-encoded: their array holds indexes into ``dictionaries[field]``.
+Columns of child rows become nested tables of all child rows together, with
+``lengths`` giving how many belong to each parent row. The body is written
+with orjson and gzipped when the client accepts it.
+"""
+
+import gzip
+
+import frappe
+import orjson
+from frappe import _
+from frappe.utils.response import json_handler
+from werkzeug.wrappers import Response
+
+# Only bodies larger than this are worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+
+@frappe.whitelist()
+def run_report(report_name=None, method=None, filters=None):
+    """Run a report and return its result columnar-encoded.
+
+    Pass ``report_name`` for a Script Report (run through the standard
+    ``query_report.run``, with its permission checks) or ``method`` for a
+    whitelisted report method such as Sales Invoice's ``execute``.
+    """
+    if report_name:
+        from frappe.desk.query_report import run
+
+        result = run(report_name, filters=filters)
+    elif method:
+        fn = frappe.get_attr(method)
+        frappe.is_whitelisted(fn)
+        result = frappe.call(fn, filters=filters)
+    else:
+        frappe.throw(_("Either report_name or method is required"))
+
+    return build_response(encode(result))
+
+
+def encode(value):
+    """``value`` with every list of row dicts replaced by a columnar table."""
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(row, dict) for row in value):
+            return encode_table(value)
+        return [encode(item) for item in value]
+    if isinstance(value, dict):
+        return {key: encode(item) for key, item in value.items()}
+    return value
+
+
+def encode_table(rows):
+    fields = list(dict.fromkeys(key for row in rows for key in row))
+    table = {"__columnar__": 1, "fields": fields, "values": [], "dictionaries": {}}
+    for field in fields:
+        column = [row.get(field) for row in rows]
+        if is_child_column(column):
+            table["values"].append(encode_child_rows(column))
+            continue
+
+        dictionary = get_dictionary(column)
+        if dictionary:
+            index = {value: i for i, value in enumerate(dictionary)}
+            column = [None if value is None else index[value] for value in column]
+            table["dictionaries"][field] = dictionary
+        table["values"].append(column)
+    return table
+
+
+def is_child_column(column):
+    """Whether every value of ``column`` is a (possibly empty) list of row dicts.
+
+    Null values count as no rows; a column that mixes lists with scalars, or
+    holds only empty lists, is left as a plain column.
+    """
+    values = [value for value in column if value is not None]
+    if not values or not any(values):
+        return False
+    return all(isinstance(value, list) and all(isinstance(row, dict) for row in value) for value in values)
+
+
+def encode_child_rows(column):
+    """All child rows of ``column`` as one table, plus the count per parent."""
+    children = [value or [] for value in column]
+    return {
+        "lengths": [len(value) for value in children],
+        "table": encode_table([row for value in children for row in value]),
+    }
+
+
+def get_dictionary(column):
+    """Distinct strings of ``column`` when dictionary encoding pays off, else None."""
+    strings = [value for value in column if value is not None]
+    if not strings or not all(isinstance(value, str) for value in strings):
+        return None
+    distinct = list(dict.fromkeys(strings))
+    # Worth it only when most values repeat one seen before
+    if len(distinct) * 2 > len(strings):
+        return None
+    return distinct
+
+
+def build_response(payload):
+    body = orjson.dumps(
+        {"message": payload},
+        default=json_handler,
+        # Dates go through json_handler, so they look as in every other response
+        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+    )
+    response = Response(content_type="application/json")
+    response.headers["Vary"] = "Accept-Encoding"
+    accepts_gzip = "gzip" in (frappe.get_request_header("Accept-Encoding") or "")
+    if accepts_gzip and len(body) > MIN_COMPRESS_BYTES:
+        body = gzip.compress(body, compresslevel=6)
+        response.headers["Content-Encoding"] = "gzip"
+    response.set_data(body)
+    return response
@@ -1,29 +1,87 @@
 import frappe
 from frappe.model.document import Document
-from frappe.utils import nowdate
+from frappe.utils import getdate, nowdate
+
+from next_app.next_app.profiler import profiled
+
+# Redis hash holding every cached lookup; dropped whenever a rate changes
+EXCHANGE_RATE_CACHE_KEY = "next_app:custom_exchange_rate"
 
 class CustomExchangeRate(Document):
-    pass
+    def on_update(self):
+        clear_exchange_rate_cache()
+
+    def on_trash(self):
+        clear_exchange_rate_cache()
+
+def on_doctype_update():
+    frappe.db.add_index("Custom Exchange Rate", ["from_currency", "to_currency", "date"])
+
+def clear_exchange_rate_cache():
+    frappe.cache.delete_value(EXCHANGE_RATE_CACHE_KEY)
+
+def get_cached(key, generator):
+    # Misses are cached as {} so unknown pairs don't hit the database every call
+    value = frappe.cache.hget(EXCHANGE_RATE_CACHE_KEY, key)
+    if value is None:
+        value = generator() or {}
+        frappe.cache.hset(EXCHANGE_RATE_CACHE_KEY, key, value)
+    return value or None
+
+def get_effective_rate(from_currency, to_currency, date=None):
+    """Rate for the pair on ``date``: the latest one dated on or before it."""
+    date = str(getdate(date or nowdate()))
+
+    def generator():
+        rate = frappe.db.sql("""
+            SELECT from_currency, to_currency, date, ex_rate
+            FROM `tabCustom Exchange Rate`
+            WHERE from_currency = %s AND to_currency = %s AND date <= %s
+            ORDER BY date DESC, creation DESC
+            LIMIT 1
+        """, (from_currency, to_currency, date), as_dict=True)
+        return rate[0] if rate else None
+
+    return get_cached(f"rate::{from_currency}::{to_currency}::{date}", generator)
+
+@frappe.whitelist()
+@profiled
+def get_exchange_rates(pairs, date=None):
+    """Effective rates for many pairs in one call.
+
+    ``pairs`` is a list of ``{"from_currency", "to_currency", "date"}`` dicts; a
+    pair without its own date uses ``date`` (default today). Missing rates come
+    back with ``ex_rate`` None, in the same order as ``pairs``.
+    """
+    rates = []
+    for pair in frappe.parse_json(pairs):
+        pair_date = str(getdate(pair.get("date") or date or nowdate()))
+        rate = get_effective_rate(pair["from_currency"], pair["to_currency"], pair_date)
+        rates.append({
+            "from_currency": pair["from_currency"],
+            "to_currency": pair["to_currency"],
+            "date": pair_date,
+            "ex_rate": rate.ex_rate if rate else None,
+        })
+    return rates
 
 @frappe.whitelist()
 def get_exchange_rate(date):
-    exchange_rate = frappe.db.get_value(
+    return get_cached(f"date::{getdate(date)}", lambda: frappe.db.get_value(
         "Custom Exchange Rate",
         {"date": date},
         ["from_currency", "to_currency", "ex_rate"],
         as_dict=True,
         order_by="date DESC",
-    )
-    return exchange_rate
+    ))
 
 @frappe.whitelist()
 def get_current_date_exchange_rate(to_currency):
     current_date = nowdate()
-    exchange_rate = frappe.db.get_value(
+    return get_cached(f"current::{to_currency}::{current_date}", lambda: frappe.db.get_value(
         "Custom Exchange Rate",
         {"date": current_date, "to_currency": to_currency},
         ["from_currency", "to_currency", "ex_rate"],
         as_dict=True,
         order_by="creation DESC",
-    )
-    return exchange_rate
\ No newline at end of file
+    ))
@@ -0,0 +1,129 @@
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt, now
+
+from next_app.next_app.report_cache import bump_after_commit
+
+# Deterministic row name, shared by the incremental upsert and the SQL rebuild
+PARTY_BALANCE_NAME = "MD5(CONCAT({party_type}, '::', {party}, '::', {company}))"
+
+# Outstanding is receivable for customers and payable for suppliers
+OUTSTANDING_SIGN = {"Customer": 1, "Supplier": -1}
+
+INVOICE_PARTY = {"Sales Invoice": "Customer", "Purchase Invoice": "Supplier"}
+
+class PartyBalance(Document):
+    pass
+
+def on_doctype_update():
+    frappe.db.add_unique("Party Balance", ["party_type", "party", "company"], constraint_name="unique_party_company")
+    # Keyset reads of the sync feed (next_app.next_app.sync)
+    frappe.db.add_index("Party Balance", ["modified", "name"])
+
+def on_gl_entry_submit(doc, method=None):
+    apply_gl_entry(doc)
+
+def on_invoice_submit(doc, method=None):
+    apply_invoice(doc, 1)
+
+def on_invoice_cancel(doc, method=None):
+    apply_invoice(doc, -1)
+
+def apply_gl_entry(gle):
+    """Add one submitted GL Entry to its party's outstanding.
+
+    There is no cancel path: ERPNext cancels a voucher by submitting reversal
+    GL Entries (debit and credit swapped), which come through here too. The
+    invoice counters are undone by the invoice's own on_cancel.
+    """
+    if gle.party_type not in OUTSTANDING_SIGN or not gle.party:
+        return
+    outstanding = OUTSTANDING_SIGN[gle.party_type] * (flt(gle.debit) - flt(gle.credit))
+    update_party_balance(gle.party_type, gle.party, gle.company, outstanding=outstanding)
+
+def apply_invoice(invoice, sign):
+    party_type = INVOICE_PARTY[invoice.doctype]
+    party = invoice.get(party_type.lower())
+    invoiced = -flt(invoice.base_grand_total) if invoice.is_return else flt(invoice.base_grand_total)
+    update_party_balance(party_type, party, invoice.company, invoiced=sign * invoiced, invoice_count=sign)
+
+def update_party_balance(party_type, party, company, invoiced=0, outstanding=0, invoice_count=0):
+    """Atomically add the given deltas to a party's running totals for a company."""
+    values = {
+        "party_type": party_type,
+        "party": party,
+        "company": company,
+        "invoiced": invoiced,
+        "outstanding": outstanding,
+        "invoice_count": invoice_count,
+        "user": frappe.session.user,
+        "now": now(),
+    }
+    name = PARTY_BALANCE_NAME.format(party_type="%(party_type)s", party="%(party)s", company="%(company)s")
+    frappe.db.sql(f"""
+        INSERT INTO `tabParty Balance`
+            (name, creation, modified, owner, modified_by, docstatus,
+             party_type, party, company, total_invoiced, outstanding_amount, paid_amount, invoice_count)
+        VALUES
+            ({name}, %(now)s, %(now)s, %(user)s, %(user)s, 0,
+             %(party_type)s, %(party)s, %(company)s, %(invoiced)s, %(outstanding)s,
+             %(invoiced)s - %(outstanding)s, %(invoice_count)s)
+        ON DUPLICATE KEY UPDATE
+            total_invoiced = total_invoiced + VALUES(total_invoiced),
+            outstanding_amount = outstanding_amount + VALUES(outstanding_amount),
+            paid_amount = total_invoiced - outstanding_amount,
+            invoice_count = invoice_count + VALUES(invoice_count),
+            modified = VALUES(modified),
+            modified_by = VALUES(modified_by)
+    """, values)
+
+@frappe.whitelist()
+def rebuild_party_balance():
+    """Recompute every Party Balance row from GL Entries and submitted invoices.
+
+    Use after installing the app or repairing data
+    (bench execute ...rebuild_party_balance).
+    """
+    frappe.only_for("System Manager")
+    frappe.db.sql("DELETE FROM `tabParty Balance`")
+    rebuilt_at = now()
+
+    frappe.db.sql(f"""
+        INSERT INTO `tabParty Balance`
+            (name, creation, modified, owner, modified_by, docstatus,
+             party_type, party, company, total_invoiced, outstanding_amount, paid_amount, invoice_count)
+        SELECT
+            {PARTY_BALANCE_NAME.format(party_type="gle.party_type", party="gle.party", company="gle.company")},
+            %(now)s, %(now)s, 'Administrator', 'Administrator', 0,
+            gle.party_type, gle.party, gle.company, 0,
+            SUM(IF(gle.party_type = 'Customer', gle.debit - gle.credit, gle.credit - gle.debit)),
+            0, 0
+        FROM `tabGL Entry` gle
+        WHERE gle.docstatus = 1
+          AND gle.party_type IN ('Customer', 'Supplier')
+          AND IFNULL(gle.party, '') != ''
+        GROUP BY gle.party_type, gle.party, gle.company
+    """, {"now": rebuilt_at})
+
+    for doctype, party_type in INVOICE_PARTY.items():
+        party_field = party_type.lower()
+        frappe.db.sql(f"""
+            INSERT INTO `tabParty Balance`
+                (name, creation, modified, owner, modified_by, docstatus,
+                 party_type, party, company, total_invoiced, outstanding_amount, paid_amount, invoice_count)
+            SELECT
+                {PARTY_BALANCE_NAME.format(party_type=f"'{party_type}'", party=f"inv.{party_field}", company="inv.company")},
+                %(now)s, %(now)s, 'Administrator', 'Administrator', 0,
+                '{party_type}', inv.{party_field}, inv.company,
+                SUM(IF(inv.is_return = 1, -inv.base_grand_total, inv.base_grand_total)),
+                0, 0, COUNT(*)
+            FROM `tab{doctype}` inv
+            WHERE inv.docstatus = 1
+            GROUP BY inv.{party_field}, inv.company
+            ON DUPLICATE KEY UPDATE
+                total_invoiced = VALUES(total_invoiced),
+                invoice_count = VALUES(invoice_count)
+        """, {"now": rebuilt_at})
+
+    frappe.db.sql("UPDATE `tabParty Balance` SET paid_amount = total_invoiced - outstanding_amount")
+    bump_after_commit(["GL Entry"])
@@ -0,0 +1,8 @@
+import frappe
+from frappe.model.document import Document
+
+class PartyClosingBalance(Document):
+    pass
+
+def on_doctype_update():
+    frappe.db.add_unique("Party Closing Balance", ["party_type", "party", "period_end"], constraint_name="unique_party_period")
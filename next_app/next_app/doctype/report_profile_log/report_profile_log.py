@@ -0,0 +1,8 @@
+import frappe
+from frappe.model.document import Document
+
+class ReportProfileLog(Document):
+    pass
+
+def on_doctype_update():
+    frappe.db.add_index("Report Profile Log", ["method", "creation"])
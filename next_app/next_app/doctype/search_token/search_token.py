@@ -0,0 +1,10 @@
+import frappe
+from frappe.model.document import Document
+
+class SearchToken(Document):
+    pass
+
+def on_doctype_update():
+    # Covers the candidate lookup (doctype + tokens -> names) without touching rows
+    frappe.db.add_index("Search Token", ["ref_doctype", "token", "ref_name"])
+    frappe.db.add_index("Search Token", ["ref_doctype", "ref_name"])
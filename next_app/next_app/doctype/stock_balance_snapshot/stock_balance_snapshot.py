@@ -0,0 +1,147 @@
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt, now
+
+from next_app.next_app.report_cache import bump_after_commit
+
+# Rows are keyed by a deterministic name so both the incremental upsert and
+# the SQL rebuild address the same record for an item and warehouse.
+SNAPSHOT_NAME = "MD5(CONCAT({item_code}, '::', {warehouse}))"
+
+# Items reconciled per transaction by the rebuild
+REBUILD_BATCH_SIZE = 200
+
+# Snapshot columns and the Stock Ledger Entry aggregate each is rebuilt from
+REBUILD_COLUMNS = {
+    "in_qty": "SUM(IF(sle.actual_qty > 0, sle.actual_qty, 0))",
+    "out_qty": "SUM(IF(sle.actual_qty < 0, sle.actual_qty, 0))",
+    "balance_qty": "SUM(sle.actual_qty)",
+    "balance_value": "SUM(sle.stock_value_difference)",
+    "valuation_rate_sum": "SUM(sle.valuation_rate)",
+    "entry_count": "COUNT(*)",
+    "valuation_rate": "AVG(sle.valuation_rate)",
+}
+
+class StockBalanceSnapshot(Document):
+    pass
+
+def on_doctype_update():
+    frappe.db.add_unique("Stock Balance Snapshot", ["item_code", "warehouse"], constraint_name="unique_item_warehouse")
+    # Keyset reads of the sync feed (next_app.next_app.sync)
+    frappe.db.add_index("Stock Balance Snapshot", ["modified", "name"])
+
+def on_stock_ledger_entry_submit(doc, method=None):
+    apply_stock_ledger_entry(doc)
+
+def apply_stock_ledger_entry(sle):
+    """Add one submitted Stock Ledger Entry to its item/warehouse snapshot.
+
+    There is no cancel path: ERPNext cancels a voucher by submitting reversal
+    entries with the opposite qty and value, and those come through here too,
+    which brings the snapshot back to balance.
+    """
+    actual_qty = flt(sle.actual_qty)
+    values = {
+        "item_code": sle.item_code,
+        "warehouse": sle.warehouse,
+        "in_qty": max(actual_qty, 0),
+        "out_qty": min(actual_qty, 0),
+        "actual_qty": actual_qty,
+        "stock_value_difference": flt(sle.stock_value_difference),
+        "valuation_rate": flt(sle.valuation_rate),
+        "user": frappe.session.user,
+        "now": now(),
+    }
+    name = SNAPSHOT_NAME.format(item_code="%(item_code)s", warehouse="%(warehouse)s")
+
+    # Single atomic upsert; concurrent postings for the same pair serialize on the row lock.
+    frappe.db.sql(f"""
+        INSERT INTO `tabStock Balance Snapshot`
+            (name, creation, modified, owner, modified_by, docstatus,
+             item_code, warehouse, in_qty, out_qty, balance_qty, balance_value,
+             valuation_rate_sum, entry_count, valuation_rate)
+        VALUES
+            ({name}, %(now)s, %(now)s, %(user)s, %(user)s, 0,
+             %(item_code)s, %(warehouse)s, %(in_qty)s, %(out_qty)s, %(actual_qty)s, %(stock_value_difference)s,
+             %(valuation_rate)s, 1, %(valuation_rate)s)
+        ON DUPLICATE KEY UPDATE
+            in_qty = in_qty + VALUES(in_qty),
+            out_qty = out_qty + VALUES(out_qty),
+            balance_qty = balance_qty + VALUES(balance_qty),
+            balance_value = balance_value + VALUES(balance_value),
+            valuation_rate_sum = valuation_rate_sum + VALUES(valuation_rate_sum),
+            entry_count = entry_count + VALUES(entry_count),
+            valuation_rate = IF(entry_count, valuation_rate_sum / entry_count, 0),
+            modified = VALUES(modified),
+            modified_by = VALUES(modified_by)
+    """, values)
+
+@frappe.whitelist()
+def rebuild_stock_balance_snapshot():
+    """Reconcile every snapshot row with the Stock Ledger Entry table.
+
+    Runs daily to repair any drift, and can be run by hand after imports
+    or data repairs (bench execute ...rebuild_stock_balance_snapshot).
+
+    Works through the items in batches, committing after each, so postings
+    only ever wait on the rows of one batch. Rows already correct are left
+    untouched (their ``modified`` too, so sync clients don't re-fetch them);
+    pairs with no ledger entries left are zeroed rather than deleted.
+    """
+    frappe.only_for("System Manager")
+    last_item = ""
+    while True:
+        item_codes = frappe.db.sql_list("""
+            SELECT item_code FROM (
+                SELECT DISTINCT item_code FROM `tabStock Ledger Entry` WHERE item_code > %(last_item)s
+                UNION
+                SELECT DISTINCT item_code FROM `tabStock Balance Snapshot` WHERE item_code > %(last_item)s
+            ) items
+            ORDER BY item_code
+            LIMIT %(batch_size)s
+        """, {"last_item": last_item, "batch_size": REBUILD_BATCH_SIZE})
+        if not item_codes:
+            break
+        reconcile_items(item_codes)
+        frappe.db.commit()
+        last_item = item_codes[-1]
+
+    bump_after_commit(["Stock Ledger Entry"])
+
+def reconcile_items(item_codes):
+    """Rewrite the snapshot rows of ``item_codes`` whose totals differ from the ledger."""
+    values = {"item_codes": tuple(item_codes), "now": now()}
+    columns = ", ".join(REBUILD_COLUMNS)
+    unchanged = " AND ".join(f"{column} <=> VALUES({column})" for column in REBUILD_COLUMNS)
+    # MariaDB applies the assignments in order, so ``modified`` is compared
+    # against the old totals before they are overwritten
+    updates = ",\n            ".join(f"{column} = VALUES({column})" for column in REBUILD_COLUMNS)
+
+    frappe.db.sql(f"""
+        INSERT INTO `tabStock Balance Snapshot`
+            (name, creation, modified, owner, modified_by, docstatus, item_code, warehouse, {columns})
+        SELECT
+            {SNAPSHOT_NAME.format(item_code="sle.item_code", warehouse="sle.warehouse")},
+            %(now)s, %(now)s, 'Administrator', 'Administrator', 0,
+            sle.item_code,
+            sle.warehouse,
+            {", ".join(REBUILD_COLUMNS.values())}
+        FROM `tabStock Ledger Entry` sle
+        WHERE sle.item_code IN %(item_codes)s
+        GROUP BY sle.item_code, sle.warehouse
+        ON DUPLICATE KEY UPDATE
+            modified = IF({unchanged}, modified, VALUES(modified)),
+            {updates}
+    """, values)
+
+    # Pairs whose entries are all gone keep their row, at zero
+    frappe.db.sql(f"""
+        UPDATE `tabStock Balance Snapshot` sb
+        SET {", ".join(f"sb.{column} = 0" for column in REBUILD_COLUMNS)}, sb.modified = %(now)s
+        WHERE sb.item_code IN %(item_codes)s
+          AND (sb.entry_count != 0 OR sb.balance_qty != 0 OR sb.balance_value != 0)
+          AND NOT EXISTS (
+              SELECT 1 FROM `tabStock Ledger Entry` sle
+              WHERE sle.item_code = sb.item_code AND sle.warehouse = sb.warehouse
+          )
+    """, values)
@@ -0,0 +1,8 @@
+import frappe
+from frappe.model.document import Document
+
+class StockClosingBalance(Document):
+    pass
+
+def on_doctype_update():
+    frappe.db.add_unique("Stock Closing Balance", ["item_code", "warehouse", "period_end"], constraint_name="unique_item_warehouse_period")
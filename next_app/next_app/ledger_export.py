@@ -0,0 +1,173 @@
+"""Streaming CSV export of the customer and stock ledgers.
+
+Rows are read from an unbuffered (server-side) cursor and written out one at a
+time, with the running balance carried along, so memory stays flat however
+many rows the ledger has. ``export_ledger`` streams a chunked CSV response;
+``enqueue_ledger_export`` writes a gzipped CSV to a private File from a
+background job and notifies the user over realtime when it is ready.
+"""
+
+import csv
+import gzip
+import io
+
+import frappe
+from frappe import _
+from frappe.utils import flt, now_datetime
+from werkzeug.wrappers import Response
+
+from next_app.next_app.closing_balance import get_party_balance_before
+from next_app.next_app.metadata_cache import get_many
+from next_app.next_app.report.customer_ledger import customer_ledger
+from next_app.next_app.report.stock_ledger_report import stock_ledger_report
+
+# Rows per chunk handed to the WSGI server
+CHUNK_ROWS = 1000
+
+REPORTS = {
+    "Customer Ledger": "customer_ledger",
+    "Stock Ledger Report": "stock_ledger_report",
+}
+
+
+def check_report_permission(report):
+    if report not in REPORTS:
+        frappe.throw(_("Report {0} can not be exported").format(report))
+    if not frappe.get_doc("Report", report).is_permitted():
+        frappe.throw(_("Not permitted to export {0}").format(report), frappe.PermissionError)
+
+
+# --- Rows ---
+
+def iter_customer_ledger(filters):
+    columns = customer_ledger.get_columns()
+    yield [column["label"] for column in columns]
+
+    balance = 0
+    if filters.get("from_date"):
+        balance = get_party_balance_before("Customer", filters.get("customer"), filters["from_date"])
+        yield [
+            filters["from_date"], "Opening Balance", "", "",
+            balance if balance > 0 else 0, -balance if balance < 0 else 0, balance,
+        ]
+
+    conditions = customer_ledger.base_party_conditions(filters) + customer_ledger.date_range_conditions(filters)
+    with frappe.db.unbuffered_cursor():
+        for e in customer_ledger.get_voucher_entries(conditions, dict(filters), as_iterator=True):
+            balance += flt(e.debit) - flt(e.credit)
+            yield [e.posting_date, e.voucher_type, e.voucher_no, e.against, flt(e.debit), flt(e.credit), balance]
+
+
+def iter_stock_ledger(filters):
+    columns = stock_ledger_report.get_columns()
+    fieldnames = [column["fieldname"] for column in columns]
+    yield [column["label"] for column in columns]
+
+    balance_map = stock_ledger_report.get_opening_balances(filters)
+    for row in stock_ledger_report.get_opening_rows(filters, balance_map):
+        yield [row[fieldname] for fieldname in fieldnames]
+
+    # Names are resolved up front: no other query may run on the connection
+    # while the unbuffered result is being read
+    conditions = stock_ledger_report.get_conditions(filters)
+    item_codes = frappe.db.sql_list(f"SELECT DISTINCT sle.item_code FROM `tabStock Ledger Entry` sle WHERE {conditions}", filters)
+    item_names = {name: item.item_name for name, item in get_many("Item", item_codes).items()}
+
+    with frappe.db.unbuffered_cursor():
+        for e in stock_ledger_report.get_entries(conditions, dict(filters), as_iterator=True):
+            # balance_map holds one running balance per item and warehouse, not per row
+            row = stock_ledger_report.get_ledger_rows([e], balance_map)[0]
+            row["item_name"] = item_names.get(e.item_code)
+            yield [row[fieldname] for fieldname in fieldnames]
+
+
+ROW_ITERATORS = {
+    "Customer Ledger": iter_customer_ledger,
+    "Stock Ledger Report": iter_stock_ledger,
+}
+
+
+def iter_csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def get_export_filename(report, extension):
+    return f"{frappe.scrub(report)}_{now_datetime().strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+
+# --- Streaming response ---
+
+@frappe.whitelist()
+def export_ledger(report, filters=None):
+    """Stream ``report`` as a chunked CSV download."""
+    check_report_permission(report)
+    filters = frappe._dict(frappe.parse_json(filters) or {})
+    site, user = frappe.local.site, frappe.session.user
+
+    def generate():
+        # The response body is produced after frappe has torn the request
+        # down, so the stream opens its own connection for the same user.
+        frappe.init(site=site)
+        frappe.connect()
+        frappe.set_user(user)
+        try:
+            for chunk in iter_csv_chunks(ROW_ITERATORS[report](filters)):
+                yield chunk.encode("utf-8")
+        finally:
+            frappe.destroy()
+
+    response = Response(generate(), mimetype="text/csv")
+    response.headers["Content-Disposition"] = f'attachment; filename="{get_export_filename(report, "csv")}"'
+    response.headers["Cache-Control"] = "no-store"
+    # Let a proxy pass chunks through instead of buffering the whole body
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+# --- Background export ---
+
+@frappe.whitelist()
+def enqueue_ledger_export(report, filters=None):
+    """Write ``report`` to a gzipped CSV File in the background; returns the job id."""
+    check_report_permission(report)
+    job = frappe.enqueue(
+        "next_app.next_app.ledger_export.write_ledger_export",
+        queue="long",
+        timeout=4 * 60 * 60,
+        report=report,
+        filters=frappe.parse_json(filters) or {},
+        user=frappe.session.user,
+    )
+    return job.id
+
+
+def write_ledger_export(report, filters, user):
+    filename = get_export_filename(report, "csv.gz")
+    path = frappe.get_site_path("private", "files", filename)
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+        for chunk in iter_csv_chunks(ROW_ITERATORS[report](frappe._dict(filters))):
+            f.write(chunk)
+
+    file_doc = frappe.get_doc({
+        "doctype": "File",
+        "file_name": filename,
+        "file_url": f"/private/files/{filename}",
+        "is_private": 1,
+    })
+    file_doc.flags.ignore_permissions = True
+    file_doc.insert()
+    frappe.db.commit()
+
+    frappe.publish_realtime(
+        "next_app_ledger_export",
+        {"report": report, "file_url": file_doc.file_url},
+        user=user,
+    )
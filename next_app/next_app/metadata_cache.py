@@ -0,0 +1,115 @@
+"""Display metadata of Items, Customers, Suppliers and Warehouses.
+
+Reports fetch their numbers first and then attach names with one ``get_many``
+per doctype, instead of joining the master tables or looking names up row by
+row. Lookups go through a process-local dict, then a Redis hash, then one
+``IN`` query for whatever is still missing.
+
+Renaming, updating or deleting a record drops it from Redis and bumps the
+doctype's version; every process compares that version on each ``get_many``
+and discards its local copy when it moved.
+"""
+
+import functools
+import json
+
+import frappe
+
+from next_app.next_app.report_cache import bump_data_versions
+
+METADATA_FIELDS = {
+    "Item": ["item_name", "item_group", "stock_uom"],
+    "Customer": ["customer_name", "customer_group"],
+    "Supplier": ["supplier_name", "supplier_group"],
+    "Warehouse": ["warehouse_name", "company"],
+}
+
+REDIS_KEY = "next_app:metadata:{0}"
+VERSION_KEY = "next_app:metadata_version:{0}"
+
+# Per process: (site, doctype) -> {"version": ..., "rows": {name: row}}
+_local_cache = {}
+# Bounds the local copy; it is simply dropped and refilled past this
+MAX_LOCAL_ROWS = 100_000
+
+
+def get_version(doctype):
+    return frappe.cache.get(frappe.cache.make_key(VERSION_KEY.format(doctype)))
+
+
+def get_local_rows(doctype):
+    version = get_version(doctype)
+    local = _local_cache.get((frappe.local.site, doctype))
+    if not local or local["version"] != version or len(local["rows"]) > MAX_LOCAL_ROWS:
+        local = _local_cache[(frappe.local.site, doctype)] = {"version": version, "rows": {}}
+    return local["rows"]
+
+
+def get_many(doctype, names):
+    """Metadata rows for ``names`` as {name: frappe._dict}; unknown names are left out."""
+    rows = get_local_rows(doctype)
+    missing = list({name for name in names if name and name not in rows})
+    if not missing:
+        return {name: rows[name] for name in names if name in rows}
+
+    redis_key = frappe.cache.make_key(REDIS_KEY.format(doctype))
+    still_missing = []
+    for name, cached in zip(missing, frappe.cache.hmget(redis_key, missing)):
+        if cached is None:
+            still_missing.append(name)
+        else:
+            rows[name] = frappe._dict(json.loads(cached))
+
+    if still_missing:
+        fetched = frappe.get_all(
+            doctype,
+            filters={"name": ["in", still_missing]},
+            fields=["name", *METADATA_FIELDS[doctype]],
+            limit_page_length=0,
+        )
+        if fetched:
+            # A raw pipeline: RedisWrapper.hset pickles and takes one field at a time
+            with frappe.cache.pipeline() as pipe:
+                pipe.hset(redis_key, mapping={row.name: json.dumps(row, default=str) for row in fetched})
+                pipe.execute()
+        for row in fetched:
+            rows[row.name] = row
+
+    return {name: rows[name] for name in names if name in rows}
+
+
+def attach(rows, doctype, key_field, fields):
+    """Set ``fields`` ({target: metadata field}) on every row from its ``key_field`` record."""
+    metadata = get_many(doctype, {row.get(key_field) for row in rows})
+    for row in rows:
+        record = metadata.get(row.get(key_field)) or {}
+        for target, field in fields.items():
+            row[target] = record.get(field)
+    return rows
+
+
+# --- Invalidation ---
+
+def clear_metadata(doctype, *names):
+    for name in names:
+        frappe.cache.hdel(REDIS_KEY.format(doctype), name)
+    frappe.cache.incr(frappe.cache.make_key(VERSION_KEY.format(doctype)))
+    # Cached report results carry these names too
+    bump_data_versions([doctype])
+
+
+def clear_after_commit(doctype, *names):
+    # Clearing before the commit would let another process re-cache the old values
+    frappe.db.after_commit.add(functools.partial(clear_metadata, doctype, *names))
+
+
+def on_update(doc, method=None):
+    clear_after_commit(doc.doctype, doc.name)
+
+
+def on_trash(doc, method=None):
+    clear_after_commit(doc.doctype, doc.name)
+
+
+def after_rename(doc, method=None, old=None, new=None, merge=False):
+    clear_after_commit(doc.doctype, old, new)
@@ -0,0 +1,130 @@
+import base64
+import hashlib
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+from next_app.next_app.report_cache import get_data_version
+
+# Pager totals: "exact" (cached per filter set and data version), "estimate"
+# (optimizer row estimate, no scan) or "has_more" (no count at all)
+COUNT_MODES = ("exact", "estimate", "has_more")
+COUNT_CACHE_TTL = 60 * 60
+
+# Filters that only pick the page or its order, never which rows match
+PAGING_FILTERS = ("start", "limit_start", "page_length", "limit_page_length", "cursor", "pagination", "order_by", "order", "count")
+
+
+def is_cursor_mode(filters):
+    """Cursor (keyset) paging is used when asked for explicitly or when a cursor is passed.
+
+    The first page is requested with ``pagination: "cursor"`` and no cursor; every
+    following page passes back the ``next_cursor`` returned with the previous one.
+    """
+    return filters.get("pagination") == "cursor" or bool(filters.get("cursor"))
+
+
+def encode_cursor(key, **state):
+    """Encode the sort key of the last row (plus any report state) as an opaque token."""
+    payload = frappe.as_json({"key": key, **state}, indent=None, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        frappe.throw(_("Invalid pagination cursor"))
+    if not isinstance(payload, dict) or not isinstance(payload.get("key"), list):
+        frappe.throw(_("Invalid pagination cursor"))
+    return frappe._dict(payload)
+
+
+def get_keyset_condition(columns, key, order="asc"):
+    """Return a condition selecting rows after ``key`` in ``columns`` order, and its values.
+
+    The row comparison is expanded into ``a > x OR (a = x AND b > y) ...`` so MariaDB
+    can seek on the leading index column instead of scanning earlier rows.
+    """
+    operator = "<" if order == "desc" else ">"
+    values = {}
+    clauses = []
+    for i, column in enumerate(columns):
+        values[f"cursor_{i}"] = key[i]
+        parts = [f"{columns[j]} = %(cursor_{j})s" for j in range(i)]
+        parts.append(f"{column} {operator} %(cursor_{i})s")
+        clauses.append("(" + " AND ".join(parts) + ")")
+    return "(" + " OR ".join(clauses) + ")", values
+
+
+def get_next_cursor(rows, fieldnames, page_length, **state):
+    """Cursor for the page after ``rows``, or None when this was the last page."""
+    if not rows or len(rows) < page_length:
+        return None
+    last = rows[-1]
+    return encode_cursor([last.get(fieldname) for fieldname in fieldnames], **state)
+
+
+def get_sort(filters, fieldnames, default_field, default_order="asc"):
+    """Validated (order_by, order) pair; unknown fields or directions fall back to defaults."""
+    order_by = filters.get("order_by") or default_field
+    if order_by not in fieldnames:
+        order_by = default_field
+    order = (filters.get("order") or default_order).lower()
+    if order not in ("asc", "desc"):
+        order = default_order
+    return order_by, order
+
+
+def get_count_mode(filters):
+    mode = filters.get("count") or "exact"
+    return mode if mode in COUNT_MODES else "exact"
+
+
+def get_cached_total(report, filters, doctypes, generator):
+    """``generator()`` cached per report, matching filters and data version of ``doctypes``.
+
+    Paging through a result reuses one count (or count-and-summary aggregate)
+    instead of recomputing it for every page, and any posting to ``doctypes``
+    moves the version so a stale total is never served.
+    """
+    matching = {key: value for key, value in filters.items() if key not in PAGING_FILTERS and value not in (None, "", [], {})}
+    payload = json.dumps({
+        "filters": matching,
+        "versions": [get_data_version(doctype) for doctype in doctypes],
+    }, sort_keys=True, default=str)
+    key = f"next_app:report_count:{report}:{hashlib.md5(payload.encode()).hexdigest()}"
+
+    value = frappe.cache.get_value(key)
+    if value is None:
+        value = generator()
+        frappe.cache.set_value(key, value, expires_in_sec=COUNT_CACHE_TTL)
+    return value
+
+
+def estimate_count(query, values=None):
+    """Rows the optimizer expects ``query`` to read, from index statistics (EXPLAIN).
+
+    Nothing is scanned, so this is cheap but only approximate; good enough for
+    "about N results" pagers.
+    """
+    plan = frappe.db.sql(f"EXPLAIN {query}", values, as_dict=True)
+    return max((cint(row.rows) for row in plan), default=0)
+
+
+def get_pager_total(report, filters, doctypes, count_query, values=None, rows_on_page=0, start=0, page_length=0):
+    """Pager total for ``count_query`` (a SELECT COUNT ...) in the filters' count mode.
+
+    In "has_more" mode no count runs: the total is the rows seen so far, plus
+    one when the page came back full, so a pager still offers a next page.
+    """
+    mode = get_count_mode(filters)
+    if mode == "has_more":
+        return start + rows_on_page + (1 if page_length and rows_on_page >= page_length else 0)
+    if mode == "estimate":
+        return estimate_count(count_query, values)
+    return get_cached_total(report, filters, doctypes, lambda: frappe.db.sql(count_query, values)[0][0])
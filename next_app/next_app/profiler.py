@@ -0,0 +1,194 @@
+"""Opt-in profiling for report ``execute`` functions and API methods.
+
+Enable per site with ``bench --site <site> set-config next_app_profiling 1``.
+Functions decorated with ``profiled`` then record their wall time; the
+outermost one also captures every statement run through ``frappe.db.sql``
+with its duration and row count, EXPLAINs SELECTs slower than
+``next_app_profiling_explain_ms`` (default 200) and writes a Report Profile
+Log from a background job. Decorated helpers called inside it (``get_data``,
+``get_total``, ...) show up as phases, and their statements are tagged with
+the phase they ran in.
+
+With profiling off the decorator costs one config lookup per call.
+"""
+
+import functools
+import json
+import math
+import time
+
+import frappe
+from frappe.utils import add_days, now_datetime
+
+DEFAULT_EXPLAIN_MS = 200
+# Keep logs readable; the statement count is still recorded in full
+MAX_LOGGED_QUERIES = 200
+MAX_QUERY_LENGTH = 2000
+
+
+def is_enabled():
+    return bool(frappe.conf.get("next_app_profiling"))
+
+
+def profiled(fn):
+    """Profile ``fn`` as a request (outermost call) or as a phase of one."""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profile = getattr(frappe.local, "next_app_profile", None)
+        if profile is not None:
+            return profile.run_phase(fn.__name__, fn, args, kwargs)
+        if not is_enabled():
+            return fn(*args, **kwargs)
+
+        filters = kwargs.get("filters") if "filters" in kwargs else (args[0] if args else kwargs)
+        profile = frappe.local.next_app_profile = Profile(f"{fn.__module__}.{fn.__name__}", filters)
+        try:
+            return profile.run(fn, args, kwargs)
+        finally:
+            frappe.local.next_app_profile = None
+
+    return wrapper
+
+
+def get_filter_shape(filters):
+    """Sorted names of the filters that are set, e.g. ``customer,from_date,to_date``."""
+    if isinstance(filters, str):
+        try:
+            filters = json.loads(filters)
+        except ValueError:
+            return ""
+    if not isinstance(filters, dict):
+        return ""
+    return ",".join(sorted(key for key, value in filters.items() if value not in (None, "", [], {})))
+
+
+class Profile:
+    def __init__(self, method, filters):
+        self.method = method
+        self.filter_shape = get_filter_shape(filters)
+        self.explain_ms = frappe.conf.get("next_app_profiling_explain_ms") or DEFAULT_EXPLAIN_MS
+        self.phases = []
+        self.queries = []
+        self.query_count = 0
+        self.current_phase = None
+
+    def run(self, fn, args, kwargs):
+        sql = frappe.db.sql
+        frappe.db.sql = functools.partial(self.run_sql, sql)
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - started
+            frappe.db.sql = sql
+        self.save(duration, get_row_count(result))
+        return result
+
+    def run_phase(self, name, fn, args, kwargs):
+        parent, self.current_phase = self.current_phase, name
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.phases.append({"phase": name, "parent": parent, "ms": to_ms(time.perf_counter() - started)})
+            self.current_phase = parent
+
+    def run_sql(self, sql, query, *args, **kwargs):
+        # Arguments pass through untouched: without values Frappe must not
+        # %-format the query, so a literal % (LIKE 'x%') stays intact
+        started = time.perf_counter()
+        result = sql(query, *args, **kwargs)
+        duration = to_ms(time.perf_counter() - started)
+
+        self.query_count += 1
+        if len(self.queries) < MAX_LOGGED_QUERIES:
+            query = str(query)
+            entry = {
+                "phase": self.current_phase,
+                "query": " ".join(query.split())[:MAX_QUERY_LENGTH],
+                "ms": duration,
+                "rows": len(result) if isinstance(result, (list, tuple)) else None,
+            }
+            if duration >= self.explain_ms and query.lstrip()[:6].upper() == "SELECT":
+                values = args[0] if args else kwargs.get("values")
+                explain_args = (values,) if values is not None else ()
+                entry["explain"] = sql(f"EXPLAIN {query}", *explain_args, as_dict=True)
+            self.queries.append(entry)
+        return result
+
+    def save(self, duration, row_count):
+        frappe.enqueue(
+            "next_app.next_app.profiler.insert_log",
+            queue="short",
+            log={
+                "method": self.method,
+                "filter_shape": self.filter_shape,
+                "user": frappe.session.user,
+                "duration_ms": to_ms(duration),
+                "query_count": self.query_count,
+                "query_ms": round(sum(query["ms"] for query in self.queries), 3),
+                "row_count": row_count,
+                "phases": frappe.as_json(self.phases),
+                "queries": frappe.as_json(self.queries),
+            },
+        )
+
+
+def to_ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def get_row_count(result):
+    # Reports return (columns, data, ...); API methods usually return the rows themselves
+    if isinstance(result, tuple) and len(result) > 1 and isinstance(result[1], list):
+        return len(result[1])
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    return None
+
+
+def insert_log(log):
+    frappe.get_doc({"doctype": "Report Profile Log", **log}).insert(ignore_permissions=True)
+
+
+# --- Summaries ---
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[max(math.ceil(pct / 100 * len(sorted_values)), 1) - 1]
+
+
+@frappe.whitelist()
+def get_profile_summary(method=None, days=7):
+    """p50/p95 duration and query count per method and filter shape over the last ``days``."""
+    frappe.only_for("System Manager")
+    filters = {"creation": [">=", add_days(now_datetime(), -int(days))]}
+    if method:
+        filters["method"] = method
+
+    groups = {}
+    for row in frappe.get_all(
+        "Report Profile Log",
+        filters=filters,
+        fields=["method", "filter_shape", "duration_ms", "query_count"],
+        order_by="creation asc",
+        limit_page_length=0,
+    ):
+        groups.setdefault((row.method, row.filter_shape), []).append(row)
+
+    summary = []
+    for (method, filter_shape), rows in groups.items():
+        durations = sorted(row.duration_ms for row in rows)
+        query_counts = sorted(row.query_count for row in rows)
+        summary.append({
+            "method": method,
+            "filter_shape": filter_shape,
+            "calls": len(rows),
+            "p50_ms": percentile(durations, 50),
+            "p95_ms": percentile(durations, 95),
+            "max_ms": durations[-1],
+            "p50_queries": percentile(query_counts, 50),
+            "p95_queries": percentile(query_counts, 95),
+        })
+    return sorted(summary, key=lambda row: row["p95_ms"], reverse=True)
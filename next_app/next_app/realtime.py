@@ -0,0 +1,124 @@
+"""Realtime push of stock and balance changes to shop dashboards.
+
+Submitting a Stock Ledger Entry publishes ``next_app_stock_update`` to the
+room of its Warehouse; GL Entries and invoices publish
+``next_app_balance_update`` to the room of their Company. Ledger cancellations
+arrive as submitted reversal entries, invoices also on cancel. Clients join with
+``frappe.realtime.doc_subscribe("Warehouse", name)`` (or "Company"), which
+checks read permission, and refresh only when told something changed::
+
+    {"warehouse": "Stores - NC", "items": ["ITEM-A", "ITEM-B"], "doctypes": ["Stock Ledger Entry"]}
+    {"company": "NextCore", "parties": [["Customer", "CUST-1"]], "doctypes": ["GL Entry", "Sales Invoice"]}
+
+``items`` / ``parties`` is None when more changed than fit in one event.
+
+Changes are coalesced twice: per transaction (a 200-line invoice queues its
+warehouses and parties once, after commit) and per burst (a short-queue job
+waits ``DEBOUNCE_SECONDS`` for more, then publishes one event per room).
+"""
+
+import json
+import time
+
+import frappe
+
+PENDING_KEY = "next_app:realtime:pending"
+SCHEDULED_KEY = "next_app:realtime:scheduled"
+
+DEBOUNCE_SECONDS = 2
+# Expires the scheduled flag should a flush job die before clearing it
+SCHEDULED_TTL = 60
+MAX_KEYS_PER_EVENT = 100
+
+# Room doctype -> (event, message field holding the changed keys)
+ROOMS = {
+    "Warehouse": ("next_app_stock_update", "items"),
+    "Company": ("next_app_balance_update", "parties"),
+}
+
+INVOICE_PARTY = {"Sales Invoice": "Customer", "Purchase Invoice": "Supplier"}
+
+
+def on_document_change(doc, method=None):
+    """doc_events hook for Stock Ledger Entry and GL Entry submit, invoice submit/cancel."""
+    if doc.doctype == "Stock Ledger Entry":
+        queue_change("Warehouse", doc.warehouse, doc.item_code, doc.doctype)
+    elif doc.doctype == "GL Entry":
+        if doc.party_type and doc.party:
+            queue_change("Company", doc.company, [doc.party_type, doc.party], doc.doctype)
+    elif doc.doctype in INVOICE_PARTY:
+        party_type = INVOICE_PARTY[doc.doctype]
+        queue_change("Company", doc.company, [party_type, doc.get(party_type.lower())], doc.doctype)
+
+
+def queue_change(room_doctype, room, key, doctype):
+    """Note a change to publish once the current transaction commits."""
+    if not room:
+        return
+    pending = frappe.flags.next_app_pending_realtime
+    if pending is None:
+        pending = frappe.flags.next_app_pending_realtime = set()
+        frappe.db.after_commit.add(flush_pending_changes)
+        frappe.db.after_rollback.add(discard_pending_changes)
+    pending.add(json.dumps([room_doctype, room, key, doctype]))
+
+
+def flush_pending_changes():
+    pending = frappe.flags.next_app_pending_realtime
+    frappe.flags.next_app_pending_realtime = None
+    if not pending:
+        return
+    # RedisWrapper's set helpers add the key prefix themselves
+    frappe.cache.sadd(PENDING_KEY, *pending)
+    schedule_publish()
+
+
+def discard_pending_changes():
+    frappe.flags.next_app_pending_realtime = None
+
+
+def schedule_publish():
+    """Start a publish job unless one is already waiting for this burst."""
+    if frappe.cache.set(frappe.cache.make_key(SCHEDULED_KEY), 1, nx=True, ex=SCHEDULED_TTL):
+        frappe.enqueue("next_app.next_app.realtime.publish_pending_changes", queue="short")
+
+
+def publish_pending_changes():
+    scheduled = frappe.cache.make_key(SCHEDULED_KEY)
+    pending_key = frappe.cache.make_key(PENDING_KEY)
+    while True:
+        # Let the rest of the burst arrive
+        time.sleep(DEBOUNCE_SECONDS)
+        with frappe.cache.pipeline() as pipe:
+            pipe.smembers(pending_key)
+            pipe.delete(pending_key)
+            pending = pipe.execute()[0]
+        publish_changes(json.loads(change) for change in pending)
+
+        frappe.cache.delete(scheduled)
+        # Changes queued while publishing saw the flag still set and relied on this job
+        if not frappe.cache.scard(PENDING_KEY) or not frappe.cache.set(scheduled, 1, nx=True, ex=SCHEDULED_TTL):
+            return
+
+
+def publish_changes(changes):
+    rooms = {}
+    for room_doctype, room, key, doctype in changes:
+        message = rooms.setdefault((room_doctype, room), {"keys": [], "doctypes": set()})
+        if key not in message["keys"]:
+            message["keys"].append(key)
+        message["doctypes"].add(doctype)
+
+    for (room_doctype, room), message in rooms.items():
+        event, key_field = ROOMS[room_doctype]
+        keys = message["keys"]
+        frappe.publish_realtime(
+            event,
+            {
+                frappe.scrub(room_doctype): room,
+                key_field: keys if len(keys) <= MAX_KEYS_PER_EVENT else None,
+                "doctypes": sorted(message["doctypes"]),
+            },
+            doctype=room_doctype,
+            docname=room,
+        )
@@ -0,0 +1,121 @@
+"""Opt-in routing of read-only report queries to a database replica.
+
+Enable per site with ``bench --site <site> set-config next_app_read_from_replica 1``.
+The connection is Frappe's own ``frappe.connect_replica`` (``replica_host``,
+``replica_db_port`` and, with ``different_credentials_for_replica``,
+``replica_db_name`` / ``replica_db_password``). Functions decorated with
+``read_from_replica`` then run against the replica while it is at most
+``next_app_replica_max_lag`` seconds (default 30) behind the primary; when it
+lags further, has stopped replicating or cannot be reached they run on the
+primary as before.
+
+The source that served the call is returned as ``next_app_data_source``
+("replica" or "primary") in the response. The replica user needs the
+REPLICATION CLIENT (MariaDB 10.5+: SLAVE MONITOR) privilege to read its lag.
+"""
+
+import functools
+
+import frappe
+
+DEFAULT_MAX_LAG = 30
+LAG_KEY = "next_app:replica_lag"
+# The measured lag is shared between workers for this long
+LAG_CHECK_INTERVAL = 5
+
+
+def is_enabled():
+    return bool(frappe.conf.get("next_app_read_from_replica") and frappe.conf.get("replica_host"))
+
+
+def get_max_lag():
+    return frappe.conf.get("next_app_replica_max_lag") or DEFAULT_MAX_LAG
+
+
+def get_data_source():
+    """Whether the current call is being served by the "replica" or the "primary"."""
+    replica_db = getattr(frappe.local, "replica_db", None)
+    return "replica" if replica_db is not None and frappe.local.db is replica_db else "primary"
+
+
+def read_from_replica(fn):
+    """Run ``fn`` on the replica when enabled and fresh enough, else on the primary."""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # Disabled, or nested inside another replica-routed call
+        if not is_enabled() or get_data_source() == "replica":
+            return fn(*args, **kwargs)
+
+        if not switch_to_replica():
+            set_response_source("primary")
+            return fn(*args, **kwargs)
+
+        try:
+            set_response_source("replica")
+            return fn(*args, **kwargs)
+        finally:
+            frappe.local.db = frappe.local.primary_db
+
+    return wrapper
+
+
+def set_response_source(source):
+    if getattr(frappe.local, "response", None) is not None:
+        frappe.local.response["next_app_data_source"] = source
+
+
+def switch_to_replica():
+    """Point ``frappe.db`` at the replica if it is within the lag limit.
+
+    The connection comes from ``frappe.connect_replica`` and stays open for
+    the rest of the request or job (``close_replica`` closes it), so every
+    routed call after the first reuses it. A replica that is lagging or
+    unreachable is remembered for ``LAG_CHECK_INTERVAL`` seconds, during which
+    calls go straight to the primary without trying to connect.
+    """
+    max_lag = get_max_lag()
+    lag = frappe.cache.get_value(LAG_KEY)
+    if lag is not None and lag > max_lag:
+        return False
+
+    if getattr(frappe.local, "replica_db", None) is None or not hasattr(frappe.local, "primary_db"):
+        frappe.connect_replica()
+    else:
+        frappe.local.db = frappe.local.replica_db
+
+    # Another worker may have measured the lag, but that says nothing about
+    # whether this one can reach the replica: connect on first use here
+    if lag is None or not frappe.flags.next_app_replica_connected:
+        measured = lag is None
+        try:
+            if measured:
+                lag = get_replica_lag(frappe.local.replica_db)
+            else:
+                frappe.local.replica_db.connect()
+            frappe.flags.next_app_replica_connected = True
+        except Exception:
+            frappe.logger("next_app").warning("Replica unavailable, reading from the primary", exc_info=True)
+            lag, measured = float("inf"), True
+        if measured:
+            frappe.cache.set_value(LAG_KEY, lag, expires_in_sec=LAG_CHECK_INTERVAL)
+
+    if lag > max_lag:
+        frappe.local.db = frappe.local.primary_db
+        return False
+    return True
+
+
+def close_replica(*args, **kwargs):
+    """after_request / after_job: close the replica connection opened for this request."""
+    replica_db = getattr(frappe.local, "replica_db", None)
+    if replica_db is not None:
+        replica_db.close()
+
+
+def get_replica_lag(db):
+    """Seconds the replica is behind; infinite when replication is not running."""
+    status = db.sql("SHOW SLAVE STATUS", as_dict=True)
+    if not status or status[0].get("Seconds_Behind_Master") is None:
+        return float("inf")
+    return status[0]["Seconds_Behind_Master"]
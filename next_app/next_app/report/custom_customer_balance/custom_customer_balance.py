@@ -1,103 +1,131 @@
 import frappe
+from frappe.utils import cint
+
+from next_app.next_app.metadata_cache import attach
+from next_app.next_app.pagination import decode_cursor, get_cached_total, get_keyset_condition, get_next_cursor, get_sort, is_cursor_mode
+from next_app.next_app.profiler import profiled
+
+# Report fieldname -> column it sorts on in the balance query
+SORT_FIELDS = {
+    "customer": "pb.party",
+    "customer_name": "c.customer_name",
+    "total_amount": "total_amount",
+    "paid_amount": "paid_amount",
+    "outstanding_amount": "outstanding_amount",
+}
 
 @frappe.whitelist()
+@profiled
 def execute(filters=None):
     if not filters:
         filters = {}
 
     columns = get_columns()
-    data, total, summary = get_data(filters)
+    data, total, summary, next_cursor = get_data(filters)
+
+    # The cursor travels in the message slot so the tuple stays compatible
+    # with frappe.desk.query_report.run.
+    message = {"next_cursor": next_cursor} if is_cursor_mode(filters) else None
     
-    return columns, data, None, None, summary, total
+    return columns, data, message, None, summary, total
 
+@profiled
 def get_data(filters):
     conditions, values = get_conditions(filters)
 
-    limit_start = filters.get("start", 0)
-    limit_page_length = filters.get("page_length", 10)
-    order_by = filters.get("order_by", "customer")
-    order = filters.get("order", "asc")
-
-    # --- GL Entries (customers) ---
-    gle_conditions = ["gle.docstatus = 1", "gle.party_type = 'Customer'"]
-    if filters.get("customer") and filters.get("customer") != "All Customers":
-        gle_conditions.append("gle.party = %(customer)s")
-    if filters.get("company"):
-        gle_conditions.append("gle.company = %(company)s")
-    gle_where = " AND ".join(gle_conditions)
+    limit_start = cint(filters.get("start", 0))
+    limit_page_length = cint(filters.get("page_length", 10))
+    order_by, order = get_sort(filters, list(SORT_FIELDS), "customer")
+    key_fields = [order_by] if order_by == "customer" else [order_by, "customer"]
+    key_columns = [SORT_FIELDS[field] for field in key_fields]
+    order_clause = ", ".join(f"{column} {order}" for column in key_columns)
 
-    gl_query = f"""
-        SELECT
-            gle.party AS customer,
-            SUM(gle.debit - gle.credit) AS outstanding_amount
-        FROM `tabGL Entry` gle
-        WHERE {gle_where}
-        GROUP BY gle.party
-    """
-    outstanding_map = {r.customer: r.outstanding_amount for r in frappe.db.sql(gl_query, filters, as_dict=True)}
-
-    # --- Sales Invoices (net of returns) ---
-    si_conditions, si_values = get_conditions(filters)
+    # Only customers with submitted invoices are listed. Zero balances are
+    # dropped here, before paging, so pages stay full and the total matches.
+    having_conditions = ["SUM(pb.invoice_count) > 0"]
+    if filters.get("hide_zero_balances"):
+        having_conditions.append("SUM(pb.outstanding_amount) != 0")
 
+    # --- Party Balance (kept current by GL Entry and Sales Invoice hooks) ---
     total_query = f"""
-        SELECT COUNT(DISTINCT si.customer)
-        FROM `tabSales Invoice` si
-        JOIN `tabCustomer` c ON c.name = si.customer
-        WHERE {si_conditions}
+        SELECT COUNT(*), SUM(outstanding_amount) FROM (
+            SELECT SUM(pb.outstanding_amount) AS outstanding_amount
+            FROM `tabParty Balance` pb
+            WHERE {conditions}
+            GROUP BY pb.party
+            HAVING {" AND ".join(having_conditions)}
+        ) customers
     """
-    total = frappe.db.sql(total_query, values=si_values)[0][0]
-
-    si_query = f"""
+    # Needed for the summary whatever the count mode, so it is always the cached exact figure
+    total, total_outstanding = get_cached_total(
+        "custom_customer_balance", filters, ["GL Entry", "Sales Invoice"],
+        lambda: frappe.db.sql(total_query, values=values)[0],
+    )
+
+    page_conditions = conditions
+    page_values = dict(values)
+    cursor = decode_cursor(filters.get("cursor"))
+    if cursor:
+        keyset, keyset_values = get_keyset_condition(key_columns, cursor.key, order)
+        if order_by not in ("customer", "customer_name"):
+            having_conditions.append(keyset)
+        else:
+            # customer and customer_name are grouping columns, so seek before aggregating
+            page_conditions += f" AND {keyset}"
+        page_values.update(keyset_values)
+    if is_cursor_mode(filters):
+        limit_start = 0
+
+    # Customer names are attached from the metadata cache; the join is only
+    # needed to sort on them
+    customer_join = "JOIN `tabCustomer` c ON c.name = pb.party" if order_by == "customer_name" else ""
+    group_by = "pb.party, c.customer_name" if customer_join else "pb.party"
+
+    balance_query = f"""
         SELECT
-            si.customer,
-            c.customer_name,
-            SUM(
-                CASE WHEN si.is_return = 1
-                     THEN -si.base_grand_total
-                     ELSE si.base_grand_total END
-            ) AS total_invoiced
-        FROM `tabSales Invoice` si
-        JOIN `tabCustomer` c ON c.name = si.customer
-        WHERE {si_conditions}
-        GROUP BY si.customer, c.customer_name
-        ORDER BY {order_by} {order}
+            pb.party AS customer,
+            SUM(pb.total_invoiced) AS total_amount,
+            SUM(pb.paid_amount) AS paid_amount,
+            SUM(pb.outstanding_amount) AS outstanding_amount
+        FROM `tabParty Balance` pb
+        {customer_join}
+        WHERE {page_conditions}
+        GROUP BY {group_by}
+        HAVING {" AND ".join(having_conditions)}
+        ORDER BY {order_clause}
         LIMIT {limit_start}, {limit_page_length}
     """
-    invoice_rows = frappe.db.sql(si_query, values=si_values, as_dict=True)
-
-    # Combine + filter
-    data = []
-    for row in invoice_rows:
-        outstanding = outstanding_map.get(row.customer, 0)
-        total_invoiced = row.total_invoiced or 0
-        paid = total_invoiced - outstanding
+    balance_rows = frappe.db.sql(balance_query, values=page_values, as_dict=True)
+    attach(balance_rows, "Customer", "customer", {"customer_name": "customer_name"})
+    next_cursor = get_next_cursor(balance_rows, key_fields, limit_page_length) if is_cursor_mode(filters) else None
 
-        data.append({
+    data = [
+        {
             "customer": row.customer,
             "customer_name": row.customer_name,
-            "total_amount": total_invoiced,
-            "paid_amount": paid,
-            "outstanding_amount": outstanding
-        })
-    
-    if filters.get("hide_zero_balances"):
-        data = [row for row in data if row.get("outstanding_amount") != 0]
-
-    total_outstanding = sum(row.get("outstanding_amount", 0) for row in data)
+            "total_amount": row.total_amount or 0,
+            "paid_amount": row.paid_amount or 0,
+            "outstanding_amount": row.outstanding_amount or 0
+        }
+        for row in balance_rows
+    ]
+
+    # Summary covers every customer matching the filters, not just this page
+    total_outstanding = total_outstanding or 0
     company_currency = frappe.get_cached_value('Company', filters.get('company'), 'default_currency') if filters.get('company') else frappe.get_cached_value('Company', frappe.defaults.get_user_default("company"), 'default_currency')
     summary = [{"label": "Total Outstanding", "value": total_outstanding, "indicator": "Red", "currency": company_currency}]
     
-    return data, total, summary
+    return data, total, summary, next_cursor
 
 def get_conditions(filters):
-    conditions = "si.docstatus = 1"
+    conditions = "pb.party_type = 'Customer'"
     values = {}
 
     if filters.get("customer") and filters.get("customer") != "All Customers":
-        conditions += " AND si.customer = %(customer)s"
+        conditions += " AND pb.party = %(customer)s"
         values["customer"] = filters["customer"]
     if filters.get("company"):
-        conditions += " AND si.company = %(company)s"
+        conditions += " AND pb.company = %(company)s"
         values["company"] = filters["company"]
 
     return conditions, values
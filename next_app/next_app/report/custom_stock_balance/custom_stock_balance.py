@@ -2,62 +2,118 @@
 # For license information, please see license.txt
 
 import frappe
+from frappe.utils import cint
+
+from next_app.next_app.metadata_cache import attach
+from next_app.next_app.pagination import decode_cursor, get_keyset_condition, get_next_cursor, get_pager_total, get_sort, is_cursor_mode
+from next_app.next_app.profiler import profiled
+from next_app.next_app.replica import read_from_replica
+from next_app.next_app.report_cache import cached_report
+from next_app.next_app.search import get_search_condition
+
+SORT_FIELDS = ["item_code", "item_name", "warehouse", "in_qty", "out_qty", "balance_qty", "valuation_rate", "balance_value"]
 
 @frappe.whitelist()
+@read_from_replica
+@profiled
+@cached_report("Stock Ledger Entry", "Item")
 def execute(filters=None):
 	if not filters:
 		filters = {}
 
 	columns = get_columns()
-	data, total = get_data(filters)
-	
-	return columns, data, total
+	data, total, next_cursor = get_data(filters)
+	report_summary = {"total": total}
+	if is_cursor_mode(filters):
+		report_summary["next_cursor"] = next_cursor
 
+	# Script Report shape: (columns, data, message, chart, report_summary)
+	return columns, data, None, None, report_summary
+
+@profiled
 def get_data(filters):
+	"""Read balances from the Stock Balance Snapshot table.
+
+	The snapshot is kept current from Stock Ledger Entry hooks, so a page is an
+	indexed read instead of an aggregation over the whole ledger.
+	"""
 	conditions, values = get_conditions(filters)
 
-	limit_start = filters.get("limit_start", 0)
-	limit_page_length = filters.get("limit_page_length", 10)
-	order_by = filters.get("order_by", "item_code")
-	order = filters.get("order", "asc")
+	limit_start = cint(filters.get("limit_start", 0))
+	limit_page_length = cint(filters.get("limit_page_length", 10))
+	order_by, order = get_sort(filters, SORT_FIELDS, "item_code")
 
-	total = frappe.db.sql(f"""
-		SELECT COUNT(DISTINCT sle.item_code, sle.warehouse)
-		FROM `tabStock Ledger Entry` sle
-		JOIN `tabItem` i ON i.name = sle.item_code
-		WHERE {conditions}
-	""", values=values)[0][0]
+	# Rows are unique per (item_code, warehouse); the sort field leads the key
+	# so keyset paging stays stable for any ordering.
+	if order_by == "warehouse":
+		key_fields = ["warehouse", "item_code"]
+	elif order_by == "item_code":
+		key_fields = ["item_code", "warehouse"]
+	else:
+		key_fields = [order_by, "item_code", "warehouse"]
+	key_columns = [("i." if field == "item_name" else "sb.") + field for field in key_fields]
+	order_clause = ", ".join(f"{column} {order}" for column in key_columns)
+
+	# Item names are attached from the metadata cache; the join is only
+	# needed to filter or sort on them
+	item_join = "JOIN `tabItem` i ON i.name = sb.item_code" if filters.get("name") or order_by == "item_name" else ""
+
+	page_conditions = conditions
+	page_values = dict(values)
+	cursor = decode_cursor(filters.get("cursor"))
+	if cursor:
+		keyset, keyset_values = get_keyset_condition(key_columns, cursor.key, order)
+		page_conditions += f" AND {keyset}"
+		page_values.update(keyset_values)
+	if is_cursor_mode(filters):
+		limit_start = 0
 
 	data = frappe.db.sql(f"""
 		SELECT
-			sle.item_code,
-			i.item_name,
-			sle.warehouse,
-			SUM(IF(sle.actual_qty > 0, sle.actual_qty, 0)) as in_qty,
-			SUM(IF(sle.actual_qty < 0, sle.actual_qty, 0)) as out_qty,
-			SUM(sle.actual_qty) as balance_qty,
-			AVG(sle.valuation_rate) as valuation_rate,
-			SUM(sle.stock_value_difference) as balance_value
-		FROM `tabStock Ledger Entry` sle
-		JOIN `tabItem` i ON i.name = sle.item_code
-		WHERE {conditions}
-		GROUP BY sle.item_code, sle.warehouse
-		ORDER BY {order_by} {order}
+			sb.item_code,
+			sb.warehouse,
+			sb.in_qty,
+			sb.out_qty,
+			sb.balance_qty,
+			sb.valuation_rate,
+			sb.balance_value
+		FROM `tabStock Balance Snapshot` sb
+		{item_join}
+		WHERE {page_conditions}
+		ORDER BY {order_clause}
 		LIMIT {limit_start}, {limit_page_length}
-	""", values=values, as_dict=True)
+	""", values=page_values, as_dict=True)
+	attach(data, "Item", "item_code", {"item_name": "item_name"})
+
+	count_query = f"""
+		SELECT COUNT(*)
+		FROM `tabStock Balance Snapshot` sb
+		{item_join}
+		WHERE {conditions}
+	"""
+	total = get_pager_total(
+		"custom_stock_balance", filters, ["Stock Ledger Entry", "Item"], count_query, values,
+		rows_on_page=len(data), start=limit_start, page_length=limit_page_length,
+	)
+
+	next_cursor = get_next_cursor(data, key_fields, limit_page_length) if is_cursor_mode(filters) else None
 	
-	return data, total
+	return data, total, next_cursor
 
 def get_conditions(filters):
-	conditions = "1=1"
+	# Pairs whose ledger entries are all gone are kept at zero by the snapshot
+	# reconcile; like the ledger itself, the report doesn't list them
+	conditions = "sb.entry_count != 0"
 	values = {}
 
 	if filters.get("warehouse") and filters.get("warehouse") != '':
-		conditions += " AND warehouse = %(warehouse)s"
+		conditions += " AND sb.warehouse = %(warehouse)s"
 		values["warehouse"] = filters["warehouse"]
 	if filters.get("name"):
-		conditions += " AND i.item_name LIKE %(item_name)s"
-		values["item_name"] = f"%{filters['name']}%"
+		# Trigram candidates instead of a leading-wildcard LIKE on the item name
+		condition, condition_values = get_search_condition("Item", filters["name"], "item_name", "sb.item_code", "i.item_name")
+		conditions += f" AND {condition}"
+		values.update(condition_values)
 
 	return conditions, values
 
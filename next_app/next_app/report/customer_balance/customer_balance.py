@@ -1,5 +1,13 @@
 import frappe
 
+from next_app.next_app.metadata_cache import attach
+from next_app.next_app.profiler import profiled
+from next_app.next_app.replica import read_from_replica
+from next_app.next_app.report_cache import cached_report
+
+@read_from_replica
+@profiled
+@cached_report("GL Entry", "Sales Invoice", "Customer")
 def execute(filters=None):
     if not filters:
         filters = {}
@@ -17,53 +25,32 @@ def execute(filters=None):
     return columns, data, None, None, summary, None
 
 
+@profiled
 def get_data(filters):
-    # --- GL Entries (customers) ---
-    gle_conditions = ["gle.docstatus = 1", "gle.party_type = 'Customer'"]
-    if filters.get("customer") and filters.get("customer") != "All Customers":
-        gle_conditions.append("gle.party = %(customer)s")
-    if filters.get("company"):
-        gle_conditions.append("gle.company = %(company)s")
-    gle_where = " AND ".join(gle_conditions)
-
-    gl_query = f"""
-        SELECT
-            gle.party AS customer,
-            SUM(gle.debit - gle.credit) AS outstanding_amount
-        FROM `tabGL Entry` gle
-        WHERE {gle_where}
-        GROUP BY gle.party
-    """
-    outstanding_map = {r.customer: r.outstanding_amount for r in frappe.db.sql(gl_query, filters, as_dict=True)}
-
-    # --- Sales Invoices (net of returns) ---
-    si_conditions = ["si.docstatus = 1"]
+    # Running totals per customer and company are kept in Party Balance by the
+    # GL Entry and invoice hooks, so no ledger aggregation is needed here.
+    conditions = ["pb.party_type = 'Customer'"]
     if filters.get("customer") and filters.get("customer") != "All Customers":
-        si_conditions.append("si.customer = %(customer)s")
+        conditions.append("pb.party = %(customer)s")
     if filters.get("company"):
-        si_conditions.append("si.company = %(company)s")
-    si_where = " AND ".join(si_conditions)
+        conditions.append("pb.company = %(company)s")
+    where = " AND ".join(conditions)
 
-    si_query = f"""
+    rows = frappe.db.sql(f"""
         SELECT
-            si.customer,
-            c.customer_name,
-            SUM(
-                CASE WHEN si.is_return = 1
-                     THEN -si.base_grand_total
-                     ELSE si.base_grand_total END
-            ) AS total_invoiced
-        FROM `tabSales Invoice` si
-        JOIN `tabCustomer` c ON c.name = si.customer
-        WHERE {si_where}
-        GROUP BY si.customer, c.customer_name
-    """
-    invoice_rows = frappe.db.sql(si_query, filters, as_dict=True)
+            pb.party AS customer,
+            SUM(pb.total_invoiced) AS total_invoiced,
+            SUM(pb.outstanding_amount) AS outstanding_amount
+        FROM `tabParty Balance` pb
+        WHERE {where}
+        GROUP BY pb.party
+        HAVING SUM(pb.invoice_count) > 0
+    """, filters, as_dict=True)
 
     # Combine + filter only customers with activity
     data = []
-    for row in invoice_rows:
-        outstanding = outstanding_map.get(row.customer, 0)
+    for row in rows:
+        outstanding = row.outstanding_amount or 0
         total = row.total_invoiced or 0
         paid = total - outstanding
 
@@ -71,13 +58,13 @@ def get_data(filters):
         if abs(total) > 0 or abs(paid) > 0:
             data.append({
                 "customer": row.customer,
-                "customer_name": row.customer_name,
+                "customer_name": None,
                 "total_amount": total,
                 "paid_amount": paid,
                 "outstanding_amount": outstanding
             })
             
-    return data
+    return attach(data, "Customer", "customer", {"customer_name": "customer_name"})
 
 
 def get_columns():
@@ -1,14 +1,27 @@
 import frappe
-from frappe.utils import flt
+from frappe.utils import cint, flt
 
+from next_app.next_app.closing_balance import get_party_balance_before
+from next_app.next_app.pagination import decode_cursor, encode_cursor, get_count_mode, get_keyset_condition, get_pager_total, is_cursor_mode
+from next_app.next_app.profiler import profiled
+from next_app.next_app.replica import read_from_replica
+
+# Sort key of a consolidated voucher row, in ORDER BY order
+VOUCHER_KEY = ["MIN(gle.posting_date)", "MIN(gle.creation)", "gle.voucher_type", "gle.voucher_no"]
+
+@read_from_replica
+@profiled
 def execute(filters=None):
     if not filters:
         filters = {}
 
     columns = get_columns()
-    data = get_data(filters)
-    total = get_total(filters)
-    return columns, data, None, None, {"total": total}
+    data, next_cursor = get_data(filters)
+    total = get_total(filters, rows_on_page=len(data))
+    report_summary = {"total": total}
+    if is_cursor_mode(filters):
+        report_summary["next_cursor"] = next_cursor
+    return columns, data, None, None, report_summary
 
 
 def get_columns():
@@ -30,10 +43,10 @@ def base_party_conditions(filters):
     """
     cond = "gle.party_type = 'Customer' AND gle.docstatus = 1 AND gle.is_cancelled = 0"
     if filters.get("customer"):
-        cond += f" AND gle.party = '{filters['customer']}'"
+        cond += " AND gle.party = %(customer)s"
     # Add company filter here if you want to constrain by company:
     # if filters.get("company"):
-    #     cond += f" AND gle.company = '{filters['company']}'"
+    #     cond += " AND gle.company = %(company)s"
     return cond
 
 
@@ -43,49 +56,52 @@ def date_range_conditions(filters):
     """
     cond = ""
     if filters.get("from_date"):
-        cond += f" AND gle.posting_date >= '{filters['from_date']}'"
+        cond += " AND gle.posting_date >= %(from_date)s"
     if filters.get("to_date"):
-        cond += f" AND gle.posting_date <= '{filters['to_date']}'"
+        cond += " AND gle.posting_date <= %(to_date)s"
     return cond
 
 
+@profiled
 def get_data(filters):
     # --- Opening Balance (strictly before from_date), WITHOUT reusing date-range conditions ---
+    # Later cursor pages carry their running balance and deep offset pages
+    # seed it from get_balance_before, so only the first page needs the opening
+    cursor = decode_cursor(filters.get("cursor"))
+    start = 0 if is_cursor_mode(filters) else cint(filters.get("start", 0))
     opening_balance = 0
-    if filters.get("from_date"):
-        open_cond = base_party_conditions(filters)
-        opening_balance = frappe.db.sql(f"""
-            SELECT COALESCE(SUM(gle.debit), 0) - COALESCE(SUM(gle.credit), 0) AS balance
-            FROM `tabGL Entry` gle
-            WHERE {open_cond}
-              AND gle.posting_date < '{filters['from_date']}'
-        """)[0][0] or 0
+    if filters.get("from_date") and not cursor and start == 0:
+        opening_balance = get_party_balance_before("Customer", filters.get("customer"), filters["from_date"])
 
     # --- Consolidated (by voucher) entries within date range ---
     main_cond = base_party_conditions(filters) + date_range_conditions(filters)
+    values = dict(filters)
+    page_length = cint(filters.get("page_length", 20))
+    having = ""
 
-    entries = frappe.db.sql(f"""
-        SELECT
-            MIN(gle.posting_date) AS posting_date,
-            gle.voucher_type,
-            gle.voucher_no,
-            GROUP_CONCAT(DISTINCT IFNULL(gle.against, '') ORDER BY gle.against SEPARATOR ', ') AS against,
-            SUM(gle.debit)  AS debit,
-            SUM(gle.credit) AS credit
-        FROM `tabGL Entry` gle
-        WHERE {main_cond}
-        GROUP BY gle.voucher_type, gle.voucher_no
-        ORDER BY MIN(gle.posting_date), MIN(gle.creation)
-        LIMIT {int(filters.get("page_length", 20))} OFFSET {int(filters.get("start", 0))}
-    """, as_dict=True)
+    # Keyset paging: seek past the last voucher of the previous page. All GL
+    # entries of a voucher share its posting date, so the date bound can also
+    # prune rows before grouping. The cursor carries the running balance.
+    if cursor:
+        keyset, keyset_values = get_keyset_condition(VOUCHER_KEY, cursor.key)
+        main_cond += " AND gle.posting_date >= %(cursor_0)s"
+        having = f"HAVING {keyset}"
+        values.update(keyset_values)
+
+    entries = get_voucher_entries(main_cond, values, having, limit=page_length, offset=start)
 
     # --- Build rows with running balance ---
     data = []
-    balance = flt(opening_balance)
+    if cursor:
+        balance = flt(cursor.balance)
+    elif start and entries:
+        balance = get_balance_before(filters, entries[0])
+    else:
+        balance = flt(opening_balance)
 
     # Opening row (always show if from_date provided; comment this block if you only want
     # to show opening when it's non-zero)
-    if filters.get("from_date") and filters.get("start", 0) == 0:
+    if filters.get("from_date") and start == 0 and not cursor:
         data.append({
             "posting_date": filters["from_date"],
             "voucher_type": "Opening Balance",
@@ -109,19 +125,82 @@ def get_data(filters):
             "balance": balance
         })
 
+    next_cursor = None
+    if is_cursor_mode(filters) and len(entries) == page_length:
+        last = entries[-1]
+        next_cursor = encode_cursor(
+            [last.posting_date, last.creation, last.voucher_type, last.voucher_no], balance=balance
+        )
+
     # If user selects a range with no transactions (e.g., today with no postings),
     # the report will still show the opening row so the balance matches the current
     # balance as of the start of that day / from_date.
-    return data
+    return data, next_cursor
 
-def get_total(filters):
+def get_voucher_entries(conditions, values, having="", limit=None, offset=0, as_iterator=False):
+    """GL entries consolidated per voucher, in ledger order."""
+    return frappe.db.sql(f"""
+        SELECT
+            MIN(gle.posting_date) AS posting_date,
+            gle.voucher_type,
+            gle.voucher_no,
+            GROUP_CONCAT(DISTINCT IFNULL(gle.against, '') ORDER BY gle.against SEPARATOR ', ') AS against,
+            SUM(gle.debit)  AS debit,
+            SUM(gle.credit) AS credit,
+            MIN(gle.creation) AS creation
+        FROM `tabGL Entry` gle
+        WHERE {conditions}
+        GROUP BY gle.voucher_type, gle.voucher_no
+        {having}
+        ORDER BY MIN(gle.posting_date), MIN(gle.creation), gle.voucher_type, gle.voucher_no
+        {f"LIMIT {int(limit)} OFFSET {int(offset)}" if limit else ""}
+    """, values, as_dict=True, as_iterator=as_iterator)
+
+@profiled
+def get_balance_before(filters, entry):
+    """Balance carried into ``entry``: everything posted for the party before it.
+
+    Computed in the database from the month-end closing balance plus the days
+    since, and the vouchers on the same date that sort ahead of ``entry``, so
+    a deep page costs about the same as the first.
+    """
+    values = dict(filters)
+    values["entry_date"] = entry.posting_date
+    cond = base_party_conditions(filters)
+
+    before_date = get_party_balance_before("Customer", filters.get("customer"), entry.posting_date)
+
+    keyset, keyset_values = get_keyset_condition(
+        VOUCHER_KEY[1:], [entry.creation, entry.voucher_type, entry.voucher_no], "desc"
+    )
+    values.update(keyset_values)
+    same_date = frappe.db.sql(f"""
+        SELECT COALESCE(SUM(amount), 0) FROM (
+            SELECT SUM(gle.debit) - SUM(gle.credit) AS amount
+            FROM `tabGL Entry` gle
+            WHERE {cond}
+              AND gle.posting_date = %(entry_date)s
+            GROUP BY gle.voucher_type, gle.voucher_no
+            HAVING {keyset}
+        ) earlier_vouchers
+    """, values)[0][0]
+
+    return flt(before_date) + flt(same_date)
+
+@profiled
+def get_total(filters, rows_on_page=0):
     main_cond = base_party_conditions(filters) + date_range_conditions(filters)
-    total_entries = frappe.db.sql(f"""
+    count_query = f"""
         SELECT COUNT(DISTINCT voucher_no)
         FROM `tabGL Entry` gle
         WHERE {main_cond}
-    """)
-    total = total_entries[0][0] if total_entries else 0
-    if filters.get("from_date"):
+    """
+    start = 0 if is_cursor_mode(filters) else cint(filters.get("start", 0))
+    total = get_pager_total(
+        "customer_ledger", filters, ["GL Entry"], count_query, filters,
+        rows_on_page=rows_on_page, start=start, page_length=cint(filters.get("page_length", 20)),
+    )
+    # "has_more" totals already count the opening row on the page
+    if filters.get("from_date") and get_count_mode(filters) != "has_more":
         total += 1
-    return total
+    return total
\ No newline at end of file
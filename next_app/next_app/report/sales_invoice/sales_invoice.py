@@ -1,11 +1,47 @@
 import frappe
+from frappe.utils import cint
+
+from next_app.next_app.pagination import decode_cursor, get_cached_total, get_keyset_condition, get_next_cursor, get_sort, is_cursor_mode
+from next_app.next_app.profiler import profiled
+from next_app.next_app.replica import read_from_replica
+from next_app.next_app.report_cache import cached_report
+from next_app.next_app.search import get_search_condition
+
+# Data versions the cached page and the cached count/summary depend on. Drafts
+# are listed and counted, so the Sales Invoice version also moves on draft
+# save, trash and rename (hooks.py), not only on submit and cancel.
+DEPENDENCIES = ("Sales Invoice", "GL Entry")
+
+SORT_FIELDS = [
+    "name", "customer", "posting_date", "posting_time", "grand_total", "status",
+    "owner", "creation", "currency", "update_stock", "outstanding_amount",
+]
+
+# Currencies change rarely; the summary's placeholder rows are cached for this long
+CURRENCY_CACHE_TTL = 60 * 60
 
 @frappe.whitelist()
+@read_from_replica
+@profiled
+@cached_report(*DEPENDENCIES)
 def execute(filters=None):
+    if not filters:
+        filters = {}
+
     columns = get_columns()
-    data, total = get_data(filters)
-    summary = get_summary(filters)
-    return columns, data, total, summary
+    # One filter plan feeds both scans: the page query and the count/summary aggregate
+    conditions, values = get_conditions(filters)
+    data = get_data(filters, conditions, values)
+    # The count comes with the summary aggregate, which every page needs, so
+    # it is always the exact figure, cached across pages of the same filters
+    total, summary = get_cached_total(
+        "sales_invoice", filters, DEPENDENCIES, lambda: get_summary(conditions, values)
+    )
+    next_cursor = None
+    if is_cursor_mode(filters):
+        order_by = get_sort(filters, SORT_FIELDS, "posting_date", "desc")[0]
+        next_cursor = get_next_cursor(data, [order_by, "name"], cint(filters.get("limit_page_length", 10)))
+    return columns, data, total, summary, next_cursor
 
 def get_columns():
     return [
@@ -22,19 +58,23 @@ def get_columns():
         {"label": "Items", "fieldname": "items", "fieldtype": "Table", "width": 400}
     ]
 
-def get_data(filters):
-    conditions = get_conditions(filters)
-
-    limit_start = filters.get("limit_start", 0)
-    limit_page_length = filters.get("limit_page_length", 10)
-    order_by = filters.get("order_by", "posting_date")
-    order = filters.get("order", "desc")
+@profiled
+def get_data(filters, conditions, values):
+    limit_start = cint(filters.get("limit_start", 0))
+    limit_page_length = cint(filters.get("limit_page_length", 10))
+    order_by, order = get_sort(filters, SORT_FIELDS, "posting_date", "desc")
 
-    total = frappe.db.sql(f"""
-        SELECT COUNT(name)
-        FROM `tabSales Invoice`
-        WHERE 1=1 {conditions}
-    """)[0][0]
+    # Keyset paging seeks past the last (sort key, name) of the previous page
+    # instead of skipping limit_start rows.
+    page_conditions = conditions
+    page_values = dict(values)
+    cursor = decode_cursor(filters.get("cursor"))
+    if cursor:
+        keyset, keyset_values = get_keyset_condition([order_by, "name"], cursor.key, order)
+        page_conditions += f" AND {keyset}"
+        page_values.update(keyset_values)
+    if is_cursor_mode(filters):
+        limit_start = 0
 
     invoices = frappe.db.sql(f"""
         SELECT
@@ -43,33 +83,69 @@ def get_data(filters):
             `tabSales Invoice`
         WHERE
             1=1
-            {conditions}
+            {page_conditions}
         ORDER BY
-            {order_by} {order}
+            {order_by} {order}, name {order}
         LIMIT
             {limit_start}, {limit_page_length}
-    """, as_dict=True)
-
-    for invoice in invoices:
-        items = frappe.db.sql(f"""
-            SELECT
-                item_code, item_name, qty, rate, amount, delivered_qty
-            FROM
-                `tabSales Invoice Item`
-            WHERE
-                parent = '{invoice.name}'
-        """, as_dict=True)
-        invoice["items"] = items
-
-    return invoices, total
-
-def get_summary(filters):
-    conditions = get_conditions(filters)
-    active_currencies = frappe.get_all("Currency", filters={"enabled": 1}, fields=["name"])
-    currency_list = [c["name"] for c in active_currencies]
-    
+    """, page_values, as_dict=True)
+
+    # Items are loaded for the whole page in one query. Pass include_items=0
+    # when the caller only needs the header rows; rows can then be expanded
+    # later through get_invoice_items.
+    if cint(filters.get("include_items", 1)):
+        items_map = get_items_map([invoice.name for invoice in invoices])
+        for invoice in invoices:
+            invoice["items"] = items_map.get(invoice.name, [])
+
+    return invoices
+
+@profiled
+def get_items_map(invoice_names):
+    """Return a dict of invoice name -> list of its Sales Invoice Item rows."""
+    items_map = {}
+    if not invoice_names:
+        return items_map
+
+    items = frappe.db.sql("""
+        SELECT
+            parent, item_code, item_name, qty, rate, amount, delivered_qty
+        FROM
+            `tabSales Invoice Item`
+        WHERE
+            parent IN %(invoice_names)s
+        ORDER BY
+            parent, idx
+    """, {"invoice_names": tuple(invoice_names)}, as_dict=True)
+
+    for item in items:
+        items_map.setdefault(item.pop("parent"), []).append(item)
+
+    return items_map
+
+@frappe.whitelist()
+@profiled
+def get_invoice_items(invoice_names):
+    """Lazily load line items for invoices returned with include_items=0."""
+    frappe.has_permission("Sales Invoice", "read", throw=True)
+    if isinstance(invoice_names, str):
+        # A JSON list of names, or a single plain name
+        invoice_names = frappe.parse_json(invoice_names) if invoice_names.lstrip().startswith("[") else [invoice_names]
+    if not invoice_names:
+        return {}
+    # Drops invoices the user can't see under user permissions
+    permitted = frappe.get_list("Sales Invoice", filters={"name": ["in", invoice_names]}, pluck="name", limit_page_length=0)
+    return get_items_map(permitted)
+
+@profiled
+def get_summary(conditions, values):
+    """Total invoice count and per-currency sales summary from one aggregate query.
+
+    The count covers every invoice matching the filters; the sales figures
+    only submitted ones.
+    """
     summary_data = {}
-    for currency in currency_list:
+    for currency in get_enabled_currencies():
         summary_data[currency] = {
             "currency": currency,
             "total_sales": 0,
@@ -80,34 +156,54 @@ def get_summary(filters):
     sales_data = frappe.db.sql(f"""
         SELECT
             currency,
-            IFNULL(SUM(grand_total), 0) as total_sales,
-            IFNULL(SUM(CASE WHEN status = 'Paid' THEN grand_total ELSE 0 END), 0) as paid_sales,
-            IFNULL(SUM(CASE WHEN status != 'Paid' AND status != 'Cancelled' THEN outstanding_amount ELSE 0 END), 0) as credit_sales
+            COUNT(name) as invoice_count,
+            IFNULL(SUM(CASE WHEN docstatus = 1 THEN grand_total ELSE 0 END), 0) as total_sales,
+            IFNULL(SUM(CASE WHEN docstatus = 1 AND status = 'Paid' THEN grand_total ELSE 0 END), 0) as paid_sales,
+            IFNULL(SUM(CASE WHEN docstatus = 1 AND status != 'Paid' AND status != 'Cancelled' THEN outstanding_amount ELSE 0 END), 0) as credit_sales
         FROM
             `tabSales Invoice`
-        WHERE docstatus = 1 {conditions}
+        WHERE 1=1 {conditions}
         GROUP BY
             currency
-    """, as_dict=True)
+    """, values, as_dict=True)
 
+    total = 0
     for row in sales_data:
+        total += row.pop("invoice_count")
         if row.currency in summary_data:
             summary_data[row.currency] = row
 
-    return list(summary_data.values())
+    return total, list(summary_data.values())
+
+def get_enabled_currencies():
+    currencies = frappe.cache.get_value("next_app:enabled_currencies")
+    if currencies is None:
+        currencies = frappe.get_all("Currency", filters={"enabled": 1}, pluck="name")
+        frappe.cache.set_value("next_app:enabled_currencies", currencies, expires_in_sec=CURRENCY_CACHE_TTL)
+    return currencies
 
 def get_conditions(filters):
     conditions = ""
+    values = {}
     if filters:
+        # Search boxes: trigram candidates instead of a leading-wildcard LIKE
         if filters.get("customer"):
-            conditions += f" AND customer LIKE '%{filters.get('customer')}%'"
+            condition, condition_values = get_search_condition("Customer", filters.get("customer"), "customer", "customer", "customer")
+            conditions += f" AND {condition}"
+            values.update(condition_values)
         if filters.get("name"):
-            conditions += f" AND name LIKE '%{filters.get('name')}%'"
+            condition, condition_values = get_search_condition("Sales Invoice", filters.get("name"), "name", "name", "name")
+            conditions += f" AND {condition}"
+            values.update(condition_values)
         if filters.get("status"):
-            conditions += f" AND status = '{filters.get('status')}'"
+            conditions += " AND status = %(status)s"
+            values["status"] = filters.get("status")
         if filters.get("date_range"):
             start_date, end_date = filters.get("date_range")
-            conditions += f" AND posting_date BETWEEN '{start_date}' AND '{end_date}'"
+            conditions += " AND posting_date BETWEEN %(start_date)s AND %(end_date)s"
+            values["start_date"] = start_date
+            values["end_date"] = end_date
         if filters.get("warehouse"):
-            conditions += f" AND set_warehouse = '{filters.get('warehouse')}'"
-    return conditions
+            conditions += " AND set_warehouse = %(warehouse)s"
+            values["warehouse"] = filters.get("warehouse")
+    return conditions, values
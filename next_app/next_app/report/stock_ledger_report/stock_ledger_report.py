@@ -2,58 +2,68 @@
 # For license information, please see license.txt
 
 import frappe
+from frappe.utils import cint, flt
 
+from next_app.next_app.closing_balance import get_stock_balances_before
+from next_app.next_app.metadata_cache import attach, get_many
+from next_app.next_app.pagination import decode_cursor, encode_cursor, get_count_mode, get_keyset_condition, get_pager_total, is_cursor_mode
+from next_app.next_app.profiler import profiled
+from next_app.next_app.replica import read_from_replica
+
+# Ledger order; the running balance is per (item_code, warehouse)
+SLE_KEY = ["sle.item_code", "sle.warehouse", "sle.posting_date", "sle.posting_time", "sle.creation", "sle.name"]
+
+@read_from_replica
+@profiled
 def execute(filters=None):
     if not filters:
         filters = {}
 
     columns = get_columns()
-    data = get_data(filters)
-    total = get_total(filters)
+    if is_cursor_mode(filters):
+        data, next_cursor = get_cursor_page(filters)
+        opening_count = 0
+    else:
+        data, opening_count = get_offset_page(filters)
+        next_cursor = None
+    total = get_total(filters, rows_on_page=len(data), opening_count=opening_count)
+
+    report_summary = {"total": total}
+    if is_cursor_mode(filters):
+        report_summary["next_cursor"] = next_cursor
 
     # return in ERPNext report format
-    return columns, data, None, None, {"total": total}
+    return columns, data, None, None, report_summary
 
 
 def get_conditions(filters):
     conditions = "1=1"
     if filters.get("warehouse"):
-        conditions += f" AND sle.warehouse = '{filters['warehouse']}'"
+        conditions += " AND sle.warehouse = %(warehouse)s"
     if filters.get("item_code"):
-        conditions += f" AND sle.item_code = '{filters['item_code']}'"
+        conditions += " AND sle.item_code = %(item_code)s"
     if filters.get("from_date"):
-        conditions += f" AND sle.posting_date >= '{filters['from_date']}'"
+        conditions += " AND sle.posting_date >= %(from_date)s"
     if filters.get("to_date"):
-        conditions += f" AND sle.posting_date <= '{filters['to_date']}'"
+        conditions += " AND sle.posting_date <= %(to_date)s"
     return conditions
 
 
-def get_data(filters):
-    conditions = get_conditions(filters)
+@profiled
+def get_opening_balances(filters, keys=None):
+    """Qty per (item_code, warehouse) before from_date, optionally only for ``keys``."""
+    if not filters.get("from_date"):
+        return {}
+    return get_stock_balances_before(
+        filters["from_date"], filters.get("warehouse"), filters.get("item_code"), keys
+    )
 
-    page_length = int(filters.get("page_length", 20))
-    start = int(filters.get("start", 0))
 
-    # --- Opening balances per item+warehouse before from_date ---
-    opening_balances = {}
-    if filters.get("from_date"):
-        opening_entries = frappe.db.sql(f"""
-            SELECT item_code, warehouse, SUM(actual_qty) as qty
-            FROM `tabStock Ledger Entry`
-            WHERE posting_date < '{filters['from_date']}'
-            { "AND warehouse = '{}'".format(filters['warehouse']) if filters.get('warehouse') else "" }
-            { "AND item_code = '{}'".format(filters['item_code']) if filters.get('item_code') else "" }
-            GROUP BY item_code, warehouse
-        """, as_dict=True)
-        for e in opening_entries:
-            opening_balances[(e.item_code, e.warehouse)] = e.qty or 0
-
-    # --- Fetch all entries in date range ---
-    entries = frappe.db.sql(f"""
+def get_entries(conditions, values, limit=None, offset=0, as_iterator=False):
+    return frappe.db.sql(f"""
         SELECT
-            sle.name, sle.posting_date, sle.posting_time,
+            sle.name, sle.posting_date, sle.posting_time, sle.creation,
             sle.item_code,
-            (SELECT item_name FROM `tabItem` WHERE name = sle.item_code) as item_name,
             sle.warehouse,
             CASE WHEN sle.actual_qty > 0 THEN sle.actual_qty ELSE 0 END as in_qty,
             CASE WHEN sle.actual_qty < 0 THEN ABS(sle.actual_qty) ELSE 0 END as out_qty,
@@ -64,50 +74,63 @@ def get_data(filters):
             sle.voucher_no
         FROM `tabStock Ledger Entry` sle
         WHERE {conditions}
-        ORDER BY sle.item_code, sle.warehouse, sle.posting_date ASC, sle.posting_time ASC, sle.creation ASC
-    """, as_dict=True)
+        ORDER BY sle.item_code, sle.warehouse, sle.posting_date ASC, sle.posting_time ASC, sle.creation ASC, sle.name ASC
+        {f"LIMIT {int(limit)} OFFSET {int(offset)}" if limit else ""}
+    """, values, as_dict=True, as_iterator=as_iterator)
 
-    ledger = []
 
-    # --- Compute running balance ---
-    balance_map = opening_balances.copy()
+def get_balance_before(conditions, values, entry):
+    """Sum of in-range qty for the entry's item and warehouse posted before ``entry``."""
+    key = [entry.get(field.split(".")[-1]) for field in SLE_KEY[2:]]
+    keyset, keyset_values = get_keyset_condition(SLE_KEY[2:], key, "desc")
+    return flt(frappe.db.sql(f"""
+        SELECT SUM(sle.actual_qty)
+        FROM `tabStock Ledger Entry` sle
+        WHERE {conditions}
+          AND sle.item_code = %(entry_item_code)s
+          AND sle.warehouse = %(entry_warehouse)s
+          AND {keyset}
+    """, {**values, **keyset_values, "entry_item_code": entry.item_code, "entry_warehouse": entry.warehouse})[0][0])
+
 
-    # insert opening balance at start of ledger if start==0
+def get_opening_rows(filters, opening_balances):
+    items = get_many("Item", {item_code for item_code, _warehouse in opening_balances})
     opening_rows = []
-    if start == 0:
-        for key, qty in opening_balances.items():
-            item_code, warehouse = key
-            item_name = frappe.db.get_value("Item", item_code, "item_name")
-            opening_rows.append({
-                "name": "Opening",
-                "posting_date": filters.get("from_date") or "",
-                "posting_time": "00:00:00",
-                "item_code": item_code,
-                "item_name": item_name,
-                "warehouse": warehouse,
-                "in_qty": 0,
-                "out_qty": 0,
-                "balance_qty": qty,
-                "valuation_rate": 0,
-                "stock_value": 0,
-                "voucher_type": "",
-                "voucher_no": ""
-            })
-
-    all_rows = []
+    for key, qty in opening_balances.items():
+        item_code, warehouse = key
+        opening_rows.append({
+            "name": "Opening",
+            "posting_date": filters.get("from_date") or "",
+            "posting_time": "00:00:00",
+            "item_code": item_code,
+            "item_name": items[item_code].item_name if item_code in items else None,
+            "warehouse": warehouse,
+            "in_qty": 0,
+            "out_qty": 0,
+            "balance_qty": qty,
+            "valuation_rate": 0,
+            "stock_value": 0,
+            "voucher_type": "",
+            "voucher_no": ""
+        })
+    return opening_rows
+
 
+def get_ledger_rows(entries, balance_map):
+    """Ledger rows for ``entries``, advancing the running balances in ``balance_map``."""
+    rows = []
     for e in entries:
         key = (e.item_code, e.warehouse)
         prev_balance = balance_map.get(key, 0)
         new_balance = prev_balance + e.actual_qty
         balance_map[key] = new_balance
 
-        all_rows.append({
+        rows.append({
             "name": e.name,
             "posting_date": e.posting_date,
             "posting_time": e.posting_time,
             "item_code": e.item_code,
-            "item_name": e.item_name,
+            "item_name": None,
             "warehouse": e.warehouse,
             "in_qty": e.in_qty,
             "out_qty": e.out_qty,
@@ -117,23 +140,122 @@ def get_data(filters):
             "voucher_type": e.voucher_type,
             "voucher_no": e.voucher_no
         })
+    return rows
+
+
+def attach_item_names(rows):
+    return attach(rows, "Item", "item_code", {"item_name": "item_name"})
+
+
+@profiled
+def get_data(filters):
+    """One page of the ledger as (rows, next_cursor), in cursor or offset mode."""
+    if is_cursor_mode(filters):
+        return get_cursor_page(filters)
+    return get_offset_page(filters)[0], None
+
 
-    # combine opening + all rows
-    final_ledger = opening_rows + all_rows
+@profiled
+def get_offset_page(filters):
+    """One offset page: opening rows for every item+warehouse first, then entries.
 
-    # --- Pagination ---
-    paged_ledger = final_ledger[start:start + page_length]
+    Only the requested page of entries is fetched. The running balance of the
+    first item+warehouse on a deep page is seeded from its opening balance plus
+    an aggregate over its earlier in-range entries, instead of replaying them.
+    Returns the rows and the number of opening rows in the whole result.
+    """
+    conditions = get_conditions(filters)
+
+    page_length = int(filters.get("page_length", 20))
+    start = int(filters.get("start", 0))
+
+    # --- Opening balances per item+warehouse before from_date ---
+    opening_balances = get_opening_balances(filters)
+
+    # --- Opening rows that fall on this page ---
+    page_openings = dict(list(opening_balances.items())[start:start + page_length])
+    opening_rows = get_opening_rows(filters, page_openings)
+
+    # --- Entries that fall on this page ---
+    entries = []
+    entry_start = max(start - len(opening_balances), 0)
+    entry_length = page_length - len(opening_rows)
+    if entry_length > 0:
+        entries = get_entries(conditions, filters, limit=entry_length, offset=entry_start)
+
+    # --- Compute running balance ---
+    balance_map = opening_balances.copy()
+    if entries and entry_start:
+        first = entries[0]
+        key = (first.item_code, first.warehouse)
+        balance_map[key] = flt(balance_map.get(key)) + get_balance_before(conditions, filters, first)
 
-    return paged_ledger
+    return opening_rows + attach_item_names(get_ledger_rows(entries, balance_map)), len(opening_balances)
 
 
-def get_total(filters):
+@profiled
+def get_cursor_page(filters):
+    """One keyset page of the ledger.
+
+    Entries are fetched only after the cursor and only up to page_length. The
+    cursor carries the running balance of the last (item, warehouse) on the
+    previous page; any other pair on this page starts from its own opening
+    balance. Opening rows are returned on the first page only, ahead of the
+    page_length entries.
+    """
+    page_length = cint(filters.get("page_length", 20))
     conditions = get_conditions(filters)
-    total = frappe.db.sql(f"""
+    values = dict(filters)
+
+    cursor = decode_cursor(filters.get("cursor"))
+    if cursor:
+        keyset, keyset_values = get_keyset_condition(SLE_KEY, cursor.key)
+        conditions += f" AND {keyset}"
+        values.update(keyset_values)
+
+    entries = get_entries(conditions, values, limit=page_length)
+
+    rows = []
+    if cursor:
+        balance_map = get_opening_balances(filters, {(e.item_code, e.warehouse) for e in entries})
+        balance_map[(cursor.key[0], cursor.key[1])] = flt(cursor.balance)
+    else:
+        opening_balances = get_opening_balances(filters)
+        rows = get_opening_rows(filters, opening_balances)
+        balance_map = opening_balances.copy()
+
+    rows += attach_item_names(get_ledger_rows(entries, balance_map))
+
+    next_cursor = None
+    if len(entries) == page_length:
+        last = entries[-1]
+        next_cursor = encode_cursor(
+            [last.get(field.split(".")[-1]) for field in SLE_KEY],
+            balance=balance_map[(last.item_code, last.warehouse)],
+        )
+
+    return rows, next_cursor
+
+
+@profiled
+def get_total(filters, rows_on_page=0, opening_count=None):
+    """Pager total; ``opening_count`` saves re-running the opening aggregation
+    when the caller already knows how many opening rows the result has."""
+    count_query = f"""
         SELECT COUNT(*)
         FROM `tabStock Ledger Entry` sle
-        WHERE {conditions}
-    """)[0][0]
+        WHERE {get_conditions(filters)}
+    """
+    start = 0 if is_cursor_mode(filters) else cint(filters.get("start", 0))
+    total = get_pager_total(
+        "stock_ledger_report", filters, ["Stock Ledger Entry"], count_query, filters,
+        rows_on_page=rows_on_page, start=start, page_length=cint(filters.get("page_length", 20)),
+    )
+
+    # offset pages are laid out as opening rows followed by entries; "has_more"
+    # totals already count the opening rows on the page
+    if filters.get("from_date") and not is_cursor_mode(filters) and get_count_mode(filters) != "has_more":
+        total += len(get_opening_balances(filters)) if opening_count is None else opening_count
     return total
 
 
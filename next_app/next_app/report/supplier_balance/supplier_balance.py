@@ -1,5 +1,13 @@
 import frappe
 
+from next_app.next_app.metadata_cache import attach
+from next_app.next_app.profiler import profiled
+from next_app.next_app.replica import read_from_replica
+from next_app.next_app.report_cache import cached_report
+
+@read_from_replica
+@profiled
+@cached_report("GL Entry", "Purchase Invoice", "Supplier")
 def execute(filters=None):
     if not filters:
         filters = {}
@@ -17,54 +25,32 @@ def execute(filters=None):
     return columns, data, None, None, summary
 
 
+@profiled
 def get_data(filters):
-    # --- GL Entries (suppliers) ---
-    gle_conditions = ["gle.docstatus = 1", "gle.party_type = 'Supplier'"]
+    # Running totals per supplier and company are kept in Party Balance by the
+    # GL Entry and invoice hooks, so no ledger aggregation is needed here.
+    conditions = ["pb.party_type = 'Supplier'"]
     if filters.get("supplier") and filters.get("supplier") != "All Suppliers":
-        gle_conditions.append("gle.party = %(supplier)s")
+        conditions.append("pb.party = %(supplier)s")
     if filters.get("company"):
-        gle_conditions.append("gle.company = %(company)s")
-    gle_where = " AND ".join(gle_conditions)
+        conditions.append("pb.company = %(company)s")
+    where = " AND ".join(conditions)
 
-    gl_query = f"""
+    rows = frappe.db.sql(f"""
         SELECT
-            gle.party AS supplier,
-            SUM(gle.credit - gle.debit) AS outstanding_amount
-        FROM `tabGL Entry` gle
-        WHERE {gle_where}
-        GROUP BY gle.party
-    """
-    outstanding_map = {r.supplier: r.outstanding_amount for r in frappe.db.sql(gl_query, filters, as_dict=True)}
-
-    # --- Purchase Invoices (net of returns) ---
-    pi_conditions = ["pi.docstatus = 1"]
-    if filters.get("supplier") and filters.get("supplier") != "All Suppliers":
-        pi_conditions.append("pi.supplier = %(supplier)s")
-    if filters.get("company"):
-        pi_conditions.append("pi.company = %(company)s")
-    pi_where = " AND ".join(pi_conditions)
-
-    pi_query = f"""
-        SELECT
-            pi.supplier,
-            s.supplier_name,
-            SUM(
-                CASE WHEN pi.is_return = 1
-                     THEN -pi.base_grand_total
-                     ELSE pi.base_grand_total END
-            ) AS total_invoiced
-        FROM `tabPurchase Invoice` pi
-        JOIN `tabSupplier` s ON s.name = pi.supplier
-        WHERE {pi_where}
-        GROUP BY pi.supplier, s.supplier_name
-    """
-
-    invoice_rows = frappe.db.sql(pi_query, filters, as_dict=True)
+            pb.party AS supplier,
+            SUM(pb.total_invoiced) AS total_invoiced,
+            SUM(pb.outstanding_amount) AS outstanding_amount
+        FROM `tabParty Balance` pb
+        WHERE {where}
+        GROUP BY pb.party
+        HAVING SUM(pb.invoice_count) > 0
+    """, filters, as_dict=True)
 
     # Combine + filter only suppliers with activity
     data = []
-    for row in invoice_rows:
-        outstanding = outstanding_map.get(row.supplier, 0)
+    for row in rows:
+        outstanding = row.outstanding_amount or 0
         total = row.total_invoiced or 0
         paid = total - outstanding
 
@@ -72,13 +58,13 @@ def get_data(filters):
         if abs(total) > 0 or abs(paid) > 0:
             data.append({
                 "supplier": row.supplier,
-                "supplier_name": row.supplier_name,
+                "supplier_name": None,
                 "total_amount": total,
                 "paid_amount": paid,
                 "outstanding_amount": outstanding
             })
             
-    return data
+    return attach(data, "Supplier", "supplier", {"supplier_name": "supplier_name"})
 
 
 def get_columns():
@@ -0,0 +1,163 @@
+"""Versioned Redis cache for report results.
+
+Every cached result is keyed by the report, its normalized filters, the user's
+roles and user permissions, and the current data version of each doctype the
+report reads. Submitting a GL Entry or Stock Ledger Entry (cancellations
+submit reversal entries) or submitting or cancelling an invoice bumps that
+doctype's version once the transaction commits, so later
+calls compute under a new key and stale results are never served; the old
+entries age out through the TTL and the size bound.
+
+The cache holds at most ``next_app_report_cache_size`` (default 1000) results;
+an index sorted by last access evicts the least recently used ones beyond
+that. Set ``next_app_disable_report_cache`` in site config to turn it off.
+"""
+
+import functools
+import hashlib
+import json
+import time
+
+import frappe
+
+from next_app.next_app.replica import get_data_source, get_max_lag
+
+CACHE_PREFIX = "next_app:report_cache"
+INDEX_KEY = f"{CACHE_PREFIX}:index"
+STATS_KEY = f"{CACHE_PREFIX}:stats"
+VERSION_KEY = "next_app:data_version:{0}"
+
+DEFAULT_TTL = 60 * 60
+DEFAULT_SIZE = 1000
+
+
+def cached_report(*doctypes):
+    """Serve ``execute`` from the cache until one of ``doctypes`` changes."""
+
+    def decorator(fn):
+        report = fn.__module__.rsplit(".", 1)[-1]
+
+        @functools.wraps(fn)
+        def wrapper(filters=None):
+            if frappe.conf.get("next_app_disable_report_cache"):
+                return fn(filters)
+
+            key = get_cache_key(report, filters, doctypes)
+            result = frappe.cache.get_value(key)
+            if result is not None:
+                record(report, "hit", key)
+                return result
+
+            result = fn(filters)
+            ttl = frappe.conf.get("next_app_report_cache_ttl") or DEFAULT_TTL
+            if get_data_source() == "replica":
+                # A lagging replica may not show the change that moved the version yet
+                ttl = min(ttl, get_max_lag())
+            frappe.cache.set_value(key, result, expires_in_sec=ttl)
+            record(report, "miss", key)
+            evict()
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def get_cache_key(report, filters, doctypes):
+    if isinstance(filters, str):
+        filters = json.loads(filters)
+    filters = {key: value for key, value in (filters or {}).items() if value not in (None, "", [], {})}
+    user = frappe.session.user
+    payload = json.dumps({
+        "filters": filters,
+        "roles": sorted(frappe.get_roles(user)),
+        "user_permissions": frappe.permissions.get_user_permissions(user),
+        "versions": [get_data_version(doctype) for doctype in doctypes],
+    }, sort_keys=True, default=str)
+    return f"{CACHE_PREFIX}:{report}:{hashlib.md5(payload.encode()).hexdigest()}"
+
+
+def record(report, outcome, key):
+    # Sorted sets are used directly: RedisWrapper's hash helpers pickle their values
+    frappe.cache.zincrby(frappe.cache.make_key(STATS_KEY), 1, f"{report}:{outcome}")
+    frappe.cache.zadd(frappe.cache.make_key(INDEX_KEY), {key: time.time()})
+
+
+def evict():
+    """Drop the least recently used results beyond the configured size."""
+    index = frappe.cache.make_key(INDEX_KEY)
+    overflow = frappe.cache.zcard(index) - (frappe.conf.get("next_app_report_cache_size") or DEFAULT_SIZE)
+    if overflow <= 0:
+        return
+    keys = [key.decode() for key, _score in frappe.cache.zpopmin(index, overflow)]
+    frappe.cache.delete_value(keys)
+
+
+# --- Data versions ---
+
+def get_data_version(doctype):
+    return int(frappe.cache.get(frappe.cache.make_key(VERSION_KEY.format(doctype))) or 0)
+
+
+def bump_data_versions(doctypes):
+    for doctype in doctypes:
+        frappe.cache.incr(frappe.cache.make_key(VERSION_KEY.format(doctype)))
+
+
+def on_document_change(doc, method=None, *args, **kwargs):
+    """doc_events hook: bump ``doc.doctype``'s version when the transaction commits.
+
+    Also hooked on Sales Invoice save, trash and rename: the Sales Invoice
+    report lists drafts, which never go through submit or cancel.
+    """
+    bump_after_commit([doc.doctype])
+
+
+def bump_after_commit(doctypes):
+    """Bump the versions of ``doctypes`` once the current transaction commits.
+
+    Bumping before the commit would let a concurrent request cache the
+    pre-posting data under the new version. A posting writes many GL and
+    stock ledger entries, so each doctype is bumped once per transaction.
+    """
+    pending = frappe.flags.next_app_pending_versions
+    if pending is None:
+        pending = frappe.flags.next_app_pending_versions = set()
+        frappe.db.after_commit.add(flush_pending_versions)
+        frappe.db.after_rollback.add(discard_pending_versions)
+    pending.update(doctypes)
+
+
+def flush_pending_versions():
+    bump_data_versions(frappe.flags.next_app_pending_versions or ())
+    frappe.flags.next_app_pending_versions = None
+
+
+def discard_pending_versions():
+    frappe.flags.next_app_pending_versions = None
+
+
+# --- Maintenance ---
+
+@frappe.whitelist()
+def get_report_cache_stats():
+    """Hit/miss counters per report and the number of cached results."""
+    frappe.only_for("System Manager")
+    stats = {}
+    for field, count in frappe.cache.zrange(frappe.cache.make_key(STATS_KEY), 0, -1, withscores=True):
+        report, outcome = field.decode().rsplit(":", 1)
+        stats.setdefault(report, {"hit": 0, "miss": 0})[outcome] = int(count)
+    return {
+        "reports": stats,
+        "entries": frappe.cache.zcard(frappe.cache.make_key(INDEX_KEY)),
+    }
+
+
+@frappe.whitelist()
+def clear_report_cache():
+    frappe.only_for("System Manager")
+    index = frappe.cache.make_key(INDEX_KEY)
+    keys = [key.decode() for key in frappe.cache.zrange(index, 0, -1)]
+    if keys:
+        frappe.cache.delete_value(keys)
+    frappe.cache.delete(index, frappe.cache.make_key(STATS_KEY))
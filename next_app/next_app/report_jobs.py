@@ -0,0 +1,130 @@
+"""Background execution of the heavy ledger reports.
+
+``enqueue_report`` puts a Customer Ledger or Stock Ledger Report run on the
+long queue and returns its job id straight away, so multi-year ranges never
+hold a web worker. The job walks the report with its keyset cursor, publishes
+``next_app_report_progress`` after every page (with the rows of the first
+pages, so the UI can render while the rest runs) and writes the finished
+result as gzipped JSON to a private File. ``get_report_job`` returns the
+job's status and, once finished, the file URL.
+"""
+
+import gzip
+
+import frappe
+from frappe import _
+from frappe.utils import now_datetime
+
+from next_app.next_app.ledger_export import REPORTS, check_report_permission
+
+JOB_KEY = "next_app:report_job:{0}"
+# Status and result links are kept this long after the job is queued
+JOB_TTL = 24 * 60 * 60
+
+PAGE_LENGTH = 500
+# Only the first rows go over realtime; the rest are in the result file
+MAX_PUBLISHED_ROWS = 5000
+
+
+def get_report_module(report):
+    module = REPORTS[report]
+    return frappe.get_module(f"next_app.next_app.report.{module}.{module}")
+
+
+def set_job_status(job_id, **status):
+    key = JOB_KEY.format(job_id)
+    current = frappe.cache.get_value(key) or {}
+    current.update(status)
+    frappe.cache.set_value(key, current, expires_in_sec=JOB_TTL)
+    return current
+
+
+@frappe.whitelist()
+def enqueue_report(report, filters=None):
+    """Run ``report`` on the long queue; returns the job id to follow it by."""
+    check_report_permission(report)
+    job_id = frappe.generate_hash(length=16)
+    set_job_status(job_id, report=report, user=frappe.session.user, status="queued", progress=0)
+    frappe.enqueue(
+        "next_app.next_app.report_jobs.run_report_job",
+        queue="long",
+        timeout=4 * 60 * 60,
+        job_id=f"next_app_report::{job_id}",
+        report_job_id=job_id,
+        report=report,
+        filters=frappe.parse_json(filters) or {},
+    )
+    return job_id
+
+
+@frappe.whitelist()
+def get_report_job(job_id):
+    status = frappe.cache.get_value(JOB_KEY.format(job_id))
+    if not status:
+        frappe.throw(_("Report job {0} not found or expired").format(job_id), frappe.DoesNotExistError)
+    is_system_manager = "System Manager" in frappe.get_roles()
+    if status["user"] != frappe.session.user and not is_system_manager:
+        frappe.throw(_("Not permitted"), frappe.PermissionError)
+    if not is_system_manager:
+        status.pop("error_log", None)
+    return status
+
+
+def run_report_job(report_job_id, report, filters):
+    module = get_report_module(report)
+    filters = frappe._dict(filters, pagination="cursor", page_length=PAGE_LENGTH)
+    filters.pop("cursor", None)
+    user = frappe.session.user
+
+    def publish(event, message):
+        frappe.publish_realtime(event, {"job_id": report_job_id, "report": report, **message}, user=user)
+
+    set_job_status(report_job_id, status="running", started=str(now_datetime()))
+    try:
+        total = module.get_total(filters)
+        filename = f"{frappe.scrub(report)}_{report_job_id}.json.gz"
+        rows_done = 0
+
+        # Written as one JSON document, a page at a time
+        with gzip.open(frappe.get_site_path("private", "files", filename), "wt", encoding="utf-8") as f:
+            f.write(f'{{"columns": {frappe.as_json(module.get_columns(), indent=None)}, "data": [')
+            while True:
+                data, next_cursor = module.get_data(filters)
+                for row in data:
+                    f.write(("," if rows_done else "") + frappe.as_json(row, indent=None))
+                    rows_done += 1
+
+                progress = min(round(rows_done * 100 / total), 99) if total else 99
+                set_job_status(report_job_id, progress=progress, rows=rows_done, total=total)
+                publish("next_app_report_progress", {
+                    "progress": progress,
+                    "rows": rows_done,
+                    "total": total,
+                    "data": data if rows_done <= MAX_PUBLISHED_ROWS else None,
+                })
+
+                if not next_cursor:
+                    break
+                filters.cursor = next_cursor
+            f.write("]}")
+
+        file_doc = frappe.get_doc({
+            "doctype": "File",
+            "file_name": filename,
+            "file_url": f"/private/files/{filename}",
+            "is_private": 1,
+        })
+        file_doc.flags.ignore_permissions = True
+        file_doc.insert()
+        frappe.db.commit()
+    except Exception as e:
+        # The traceback goes to the Error Log; the status only names it
+        frappe.db.rollback()
+        error_log = frappe.log_error(title=f"{report} report job failed")
+        frappe.db.commit()
+        set_job_status(report_job_id, status="failed", error=str(e), error_log=error_log.name)
+        publish("next_app_report_done", {"status": "failed"})
+        raise
+
+    set_job_status(report_job_id, status="finished", progress=100, rows=rows_done, file_url=file_doc.file_url)
+    publish("next_app_report_done", {"status": "finished", "rows": rows_done, "file_url": file_doc.file_url})
@@ -0,0 +1,178 @@
+"""Trigram search for the report filters that used to run ``LIKE '%x%'``.
+
+Every searchable value is split into lowercase trigrams kept in the Search
+Token table, indexed on (ref_doctype, token, ref_name). A term of three or
+more characters becomes its trigrams; the records holding the rarest of them
+are the candidates, and only those few rows are checked with the real ``LIKE``.
+So infix matches read index ranges instead of scanning the source table.
+Shorter terms, and terms too common for the index to narrow down, fall back
+to the plain ``LIKE '%term%'``.
+
+Tokens are kept current by the doc_events hooks below and can be rebuilt
+with ``rebuild_search_tokens``.
+"""
+
+import hashlib
+
+import frappe
+from frappe import _
+
+# Fields searched per doctype; a record matches when any of them contains the term
+SEARCH_FIELDS = {
+    "Item": ["item_name"],
+    "Customer": ["name"],
+    "Sales Invoice": ["name"],
+}
+
+MIN_TERM_LENGTH = 3
+# Past this many records for its rarest trigram a term is answered by LIKE
+MAX_CANDIDATES = 10000
+REBUILD_BATCH_SIZE = 5000
+
+
+def get_trigrams(text):
+    text = (text or "").lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def get_candidates(doctype, term):
+    """Names of ``doctype`` records whose search fields contain ``term``.
+
+    Returns None when the index can't answer: terms shorter than three
+    characters, or terms so common that even their rarest trigram is held by
+    more than ``MAX_CANDIDATES`` records. Callers then run the plain
+    ``LIKE '%term%'``, so results are never cut short.
+    """
+    term = (term or "").strip()
+    if len(term) < MIN_TERM_LENGTH:
+        return None
+
+    # Records per trigram, each count stopping at MAX_CANDIDATES + 1 index
+    # entries, so frequent trigrams cost no more than rare ones
+    trigrams = sorted(get_trigrams(term))
+    values = {"doctype": doctype, "limit": MAX_CANDIDATES + 1}
+    subqueries = []
+    for i, token in enumerate(trigrams):
+        values[f"token_{i}"] = token
+        subqueries.append(f"""(
+            SELECT token FROM `tabSearch Token`
+            WHERE ref_doctype = %(doctype)s AND token = %(token_{i})s
+            LIMIT %(limit)s
+        )""")
+    counts = dict(frappe.db.sql(f"""
+        SELECT token, COUNT(*) FROM ({" UNION ALL ".join(subqueries)}) tokens GROUP BY token
+    """, values))
+    if len(counts) < len(trigrams):
+        # Some trigram occurs nowhere
+        return []
+
+    rarest = min(trigrams, key=lambda token: counts[token])
+    if counts[rarest] > MAX_CANDIDATES:
+        return None
+
+    candidates = frappe.db.sql_list("""
+        SELECT ref_name FROM `tabSearch Token`
+        WHERE ref_doctype = %(doctype)s AND token = %(token)s
+    """, {"doctype": doctype, "token": rarest})
+
+    # The rarest trigram narrows the records down; the real match is checked here
+    match = " OR ".join(f"`{field}` LIKE %(term)s" for field in SEARCH_FIELDS[doctype])
+    return frappe.db.sql_list(f"""
+        SELECT name FROM `tab{doctype}`
+        WHERE name IN %(candidates)s AND ({match})
+    """, {"candidates": tuple(candidates), "term": f"%{term}%"})
+
+
+def get_search_condition(doctype, term, param, key_column, like_column):
+    """Report condition (and its values) for a search filter on ``doctype``.
+
+    Matches ``key_column`` against the indexed candidates, or runs the plain
+    ``like_column LIKE '%term%'`` when the index can't answer the term.
+    """
+    candidates = get_candidates(doctype, term)
+    if candidates is None:
+        return f"{like_column} LIKE %({param})s", {param: f"%{term.strip()}%"}
+    if not candidates:
+        return "1=0", {}
+    return f"{key_column} IN %({param})s", {param: tuple(candidates)}
+
+
+@frappe.whitelist()
+def search(doctype, txt, limit=20):
+    """Search-as-you-type over the indexed doctypes."""
+    if doctype not in SEARCH_FIELDS:
+        frappe.throw(_("{0} is not searchable").format(doctype))
+    frappe.has_permission(doctype, "read", throw=True)
+
+    names = get_candidates(doctype, txt)
+    if names is None:
+        or_filters = {field: ["like", f"%{txt.strip()}%"] for field in SEARCH_FIELDS[doctype]}
+        return frappe.get_list(doctype, or_filters=or_filters, pluck="name", limit_page_length=limit)
+    if not names:
+        return []
+    return frappe.get_list(doctype, filters={"name": ["in", names]}, pluck="name", limit_page_length=limit)
+
+
+# --- Indexing ---
+
+def get_token_rows(doctype, name, values):
+    trigrams = set()
+    for value in values:
+        trigrams |= get_trigrams(value)
+    for token in trigrams:
+        yield (hashlib.md5(f"{doctype}::{name}::{token}".encode()).hexdigest(), doctype, name, token)
+
+
+def insert_tokens(rows):
+    frappe.db.bulk_insert("Search Token", ["name", "ref_doctype", "ref_name", "token"], rows, ignore_duplicates=True)
+
+
+def delete_tokens(doctype, name):
+    frappe.db.delete("Search Token", {"ref_doctype": doctype, "ref_name": name})
+
+
+def index_document(doc, method=None):
+    delete_tokens(doc.doctype, doc.name)
+    insert_tokens(get_token_rows(doc.doctype, doc.name, [doc.get(field) for field in SEARCH_FIELDS[doc.doctype]]))
+
+
+def on_update(doc, method=None):
+    if any(doc.has_value_changed(field) for field in SEARCH_FIELDS[doc.doctype]):
+        index_document(doc)
+
+
+def on_trash(doc, method=None):
+    delete_tokens(doc.doctype, doc.name)
+
+
+def after_rename(doc, method=None, old=None, new=None, merge=False):
+    delete_tokens(doc.doctype, old)
+    index_document(doc)
+
+
+@frappe.whitelist()
+def rebuild_search_tokens(doctype=None):
+    """Re-tokenize every record of ``doctype`` (default: all searchable doctypes)."""
+    frappe.only_for("System Manager")
+    for dt in [doctype] if doctype else SEARCH_FIELDS:
+        fields = SEARCH_FIELDS[dt]
+        columns = ", ".join(f"`{field}`" for field in {"name", *fields})
+        frappe.db.delete("Search Token", {"ref_doctype": dt})
+
+        last_name = ""
+        while True:
+            records = frappe.db.sql(f"""
+                SELECT {columns}
+                FROM `tab{dt}`
+                WHERE name > %s
+                ORDER BY name
+                LIMIT {REBUILD_BATCH_SIZE}
+            """, (last_name,), as_dict=True)
+            if not records:
+                break
+            rows = []
+            for record in records:
+                rows.extend(get_token_rows(dt, record.name, [record.get(field) for field in fields]))
+            insert_tokens(rows)
+            frappe.db.commit()
+            last_name = records[-1].name
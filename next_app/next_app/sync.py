@@ -0,0 +1,165 @@
+"""Incremental "changes since" feed for the /next invoice and stock views.
+
+Instead of re-running a report to see whether anything changed, the frontend
+keeps one watermark per source and calls ``get_changes`` with them. Each
+source returns only the rows whose ``modified`` is past its watermark, read in
+(modified, name) order from an index on those columns, together with the new
+watermark to send next time. A first call without watermarks returns just the
+current ones, so a client syncs from the moment it loaded its page.
+
+Rows that no longer belong in a view come back as tombstones (names only):
+cancelled or deleted Sales Invoices, and stock balances with no ledger
+entries left.
+
+Timestamps are compared with a cutoff from the application clock (the one
+``modified`` is written with), ``next_app_sync_settle_seconds`` (default 60)
+in the past: a transaction still open may yet commit a row with an earlier
+``modified`` than rows already visible, so the newest rows wait for the next
+call.
+"""
+
+from datetime import timedelta
+
+import frappe
+from frappe import _
+from frappe.utils import cint, now_datetime
+
+from next_app.next_app.metadata_cache import attach
+from next_app.next_app.pagination import decode_cursor, encode_cursor, get_keyset_condition
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+SOURCES = {
+    "sales_invoice": {
+        "doctype": "Sales Invoice",
+        "fields": [
+            "name", "customer", "posting_date", "posting_time", "grand_total", "status",
+            "owner", "creation", "currency", "update_stock", "docstatus",
+        ],
+        "tombstone": "docstatus = 2",
+        # Deleted drafts leave a Deleted Document behind
+        "deleted_documents": True,
+    },
+    "stock_balance": {
+        "doctype": "Stock Balance Snapshot",
+        "fields": [
+            "name", "item_code", "warehouse", "in_qty", "out_qty", "balance_qty",
+            "valuation_rate", "balance_value", "entry_count",
+        ],
+        # Pairs with no ledger entries left, zeroed by the snapshot reconcile;
+        # the same rows custom_stock_balance leaves out
+        "tombstone": "entry_count = 0",
+    },
+    "party_balance": {
+        "doctype": "Party Balance",
+        "fields": [
+            "name", "party_type", "party", "company", "total_invoiced",
+            "paid_amount", "outstanding_amount", "invoice_count",
+        ],
+    },
+}
+
+KEY_COLUMNS = ["modified", "name"]
+DELETED_KEY_COLUMNS = ["creation", "name"]
+DEFAULT_SETTLE_SECONDS = 60
+
+
+def add_sync_indexes():
+    """Indexes for the keyset reads below on doctypes next_app doesn't own.
+
+    Runs from the after_install and after_migrate hooks; next_app's own
+    doctypes add theirs in ``on_doctype_update``.
+    """
+    frappe.db.add_index("Sales Invoice", KEY_COLUMNS)
+    frappe.db.add_index("Deleted Document", ["deleted_doctype", *DELETED_KEY_COLUMNS])
+
+
+def get_cutoff():
+    settle_seconds = cint(frappe.conf.get("next_app_sync_settle_seconds")) or DEFAULT_SETTLE_SECONDS
+    return now_datetime() - timedelta(seconds=settle_seconds)
+
+
+@frappe.whitelist()
+def get_changes(since=None, sources=None, limit=DEFAULT_LIMIT):
+    """Rows changed after the given watermarks, per source.
+
+    ``since`` maps a source name to the watermark it last returned; ``sources``
+    limits the call to some of them. Each source answers with ``rows``,
+    ``deleted`` (tombstoned names), ``watermark`` and ``has_more`` (call again
+    straight away for the rest).
+    """
+    since = frappe.parse_json(since) or {}
+    sources = frappe.parse_json(sources) or list(SOURCES)
+    limit = min(cint(limit) or DEFAULT_LIMIT, MAX_LIMIT)
+    cutoff = get_cutoff()
+
+    changes = {}
+    for source in sources:
+        if source not in SOURCES:
+            frappe.throw(_("Unknown sync source {0}").format(source))
+        frappe.has_permission(SOURCES[source]["doctype"], "read", throw=True)
+        changes[source] = get_source_changes(source, since.get(source), limit, cutoff)
+    return changes
+
+
+def get_source_changes(source, watermark, limit, cutoff):
+    config = SOURCES[source]
+    cursor = decode_cursor(watermark)
+    if not cursor:
+        # Sync starts at the cutoff; everything before it is what the client loaded
+        start = [cutoff, ""]
+        return {"rows": [], "deleted": [], "watermark": encode_cursor(start, deleted=start), "has_more": False}
+
+    condition, values = get_keyset_condition(KEY_COLUMNS, cursor.key)
+    values["cutoff"] = cutoff
+    tombstone = config.get("tombstone")
+    fields = ", ".join(config["fields"])
+    tombstone_column = f", ({tombstone}) AS is_tombstone" if tombstone else ""
+    changed = frappe.db.sql(f"""
+        SELECT {fields}, modified{tombstone_column}
+        FROM `tab{config['doctype']}`
+        WHERE {condition} AND modified < %(cutoff)s
+        ORDER BY modified, name
+        LIMIT {limit}
+    """, values, as_dict=True)
+
+    rows, deleted = [], []
+    for row in changed:
+        if row.pop("is_tombstone", None):
+            deleted.append(row.name)
+        else:
+            rows.append(row)
+    if source == "stock_balance" and rows:
+        attach(rows, "Item", "item_code", {"item_name": "item_name"})
+
+    key = [changed[-1].modified, changed[-1].name] if changed else cursor.key
+    deleted_key = cursor.get("deleted") or key
+    has_more = len(changed) == limit
+
+    if config.get("deleted_documents"):
+        deleted_documents = get_deleted_documents(config["doctype"], deleted_key, limit, cutoff)
+        deleted.extend(document.deleted_name for document in deleted_documents)
+        if deleted_documents:
+            deleted_key = [deleted_documents[-1].creation, deleted_documents[-1].name]
+        has_more = has_more or len(deleted_documents) == limit
+
+    return {
+        "rows": rows,
+        "deleted": deleted,
+        "watermark": encode_cursor(key, deleted=deleted_key),
+        "has_more": has_more,
+    }
+
+
+def get_deleted_documents(doctype, key, limit, cutoff):
+    """Deleted Document records of ``doctype`` created after ``key``, before ``cutoff``."""
+    condition, values = get_keyset_condition(DELETED_KEY_COLUMNS, key)
+    values.update({"doctype": doctype, "cutoff": cutoff})
+    return frappe.db.sql(f"""
+        SELECT name, creation, deleted_name
+        FROM `tabDeleted Document`
+        WHERE deleted_doctype = %(doctype)s AND {condition} AND creation < %(cutoff)s
+        ORDER BY creation, name
+        LIMIT {limit}
+    """, values, as_dict=True)
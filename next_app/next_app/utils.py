@@ -1,5 +1,7 @@
 import frappe
 
+from next_app.next_app.doctype.custom_exchange_rate.custom_exchange_rate import get_effective_rate
+
 @frappe.whitelist()
 def get_company_name():
     # Get the first active company
@@ -14,15 +16,11 @@ def get_company_name():
 def set_source_exchange_rate(doc, method):
     if doc.payment_type == "Pay" and doc.party_type == "Supplier":
         if not doc.source_exchange_rate:
-            latest_exchange_rate = frappe.get_all(
-                "Custom Exchange Rate",
-                filters={"from_currency": doc.paid_to_account_currency, "to_currency": doc.paid_from_account_currency},
-                fields=["ex_rate"],
-                order_by="creation desc",
-                limit=1
+            exchange_rate = get_effective_rate(
+                doc.paid_to_account_currency, doc.paid_from_account_currency, doc.posting_date
             )
-            if latest_exchange_rate:
-                doc.source_exchange_rate = latest_exchange_rate[0].ex_rate
+            if exchange_rate:
+                doc.source_exchange_rate = exchange_rate.ex_rate
 @frappe.whitelist()
 def on_warehouse_before_insert(doc, method):
     # Find the parent account by account number
@@ -0,0 +1,5 @@
+from next_app.next_app.closing_balance import build_closing_balances
+
+
+def execute():
+    build_closing_balances()
@@ -0,0 +1,5 @@
+from next_app.next_app.doctype.party_balance.party_balance import rebuild_party_balance
+
+
+def execute():
+    rebuild_party_balance()
@@ -0,0 +1,5 @@
+from next_app.next_app.search import rebuild_search_tokens
+
+
+def execute():
+    rebuild_search_tokens()
\ No newline at end of file
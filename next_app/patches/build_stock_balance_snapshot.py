@@ -0,0 +1,5 @@
+from next_app.next_app.doctype.stock_balance_snapshot.stock_balance_snapshot import rebuild_stock_balance_snapshot
+
+
+def execute():
+    rebuild_stock_balance_snapshot()
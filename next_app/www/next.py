@@ -1,18 +1,57 @@
 import frappe
 
+import hashlib
 import json
 import re
 
+from werkzeug.exceptions import NotModified
+
 no_cache = 1
 
 SCRIPT_TAG_PATTERN = re.compile(r"\<script[^<]*\</script\>")
 CLOSING_SCRIPT_TAG_PATTERN = re.compile(r"</script\>")
 
+# Encoded boot is reused for at most this long, even if nothing invalidates it
+BOOT_CACHE_TTL = 10 * 60
+
 def get_context(context):
     # csrf_token = frappe.sessions.get_csrf_token()
     # frappe.db.commit()
     # context.csrf_token = csrf_token
 
+    boot = get_cached_boot()
+    frappe.flags.next_app_boot_etag = boot["etag"]
+
+    context.update({
+        "build_version": frappe.utils.get_build_version(),
+        "boot": boot["boot"],
+    })
+
+    return context
+
+def get_boot_cache_key():
+    return f"next_app:boot:{frappe.session.user}:{frappe.session.sid}:{frappe.utils.get_build_version()}"
+
+def get_valid_cached_boot(key):
+    """Cached boot for this session, as long as frappe's own boot cache for the user still exists.
+
+    frappe drops the user's ``bootinfo`` whenever their session boot must be
+    rebuilt (permission, default or settings changes), so that is used as the
+    invalidation signal.
+    """
+    cached = frappe.cache.get_value(key)
+    if not cached:
+        return None
+    if frappe.session.user != "Guest" and not frappe.cache.hexists("bootinfo", frappe.session.user):
+        return None
+    return cached
+
+def get_cached_boot():
+    key = get_boot_cache_key()
+    cached = get_valid_cached_boot(key)
+    if cached:
+        return cached
+
     if frappe.session.user == "Guest":
         boot = frappe.website.utils.get_boot_data()
     else:
@@ -26,12 +65,32 @@ def get_context(context):
     boot_json = CLOSING_SCRIPT_TAG_PATTERN.sub("", boot_json)
     boot_json = json.dumps(boot_json)
 
-    context.update({
-        "build_version": frappe.utils.get_build_version(),
+    cached = {
         "boot": boot_json,
-    })
+        "etag": hashlib.md5(f"{key}:{boot_json}".encode()).hexdigest(),
+    }
+    frappe.cache.set_value(key, cached, expires_in_sec=BOOT_CACHE_TTL)
+    return cached
 
-    return context
+def is_next_request():
+    return frappe.request.method == "GET" and (frappe.request.path == "/next" or frappe.request.path.startswith("/next/"))
+
+def check_not_modified():
+    """before_request: answer 304 for an unchanged /next shell without rendering it."""
+    if not is_next_request() or not frappe.request.if_none_match:
+        return
+    cached = get_valid_cached_boot(get_boot_cache_key())
+    if cached and frappe.request.if_none_match.contains(cached["etag"]):
+        raise NotModified
+
+def set_etag(response=None, request=None):
+    """after_request: tag the /next shell so the browser can revalidate it."""
+    etag = frappe.flags.next_app_boot_etag
+    if not etag or not response or not is_next_request():
+        return
+    response.set_etag(etag)
+    # Must revalidate on every load, but may be stored for a 304
+    response.headers["Cache-Control"] = "private, no-cache"
 
 def add_my_custom_field():
     """Adds a custom field 'my_custom_field' to the 'Customer' DocType."""
@@ -49,4 +108,4 @@ def add_my_custom_field():
         frappe.msgprint("Custom field 'Phone No' already exists on Customer DocType.")
         print("Custom field 'Phone No' already exists on Customer DocType.")
 
-    frappe.db.commit()
\ No newline at end of file
+    frappe.db.commit()